@@ -29,6 +29,13 @@ class Config:
     DEFAULT_CONFIG = {
         "adb": {
             "path": "adb.exe" if os.name == "nt" else "adb",
+            "serial": "",  # Серийный номер эмулятора (adb -s); пусто - единственное устройство
+            "persistent_shell": True,  # Одна постоянная сессия adb shell вместо процесса на команду
+            "socket_client": True,  # Команды напрямую через adb сервер (tcp:5037) без запуска adb
+            "server_host": "127.0.0.1",  # Адрес adb сервера для прямых команд
+            "server_port": 5037,  # Порт adb сервера (ANDROID_ADB_SERVER_PORT)
+            "tap_backend": "input",  # "input" - input tap, "sendevent" - прямые события сенсора
+            "capture_mode": "auto",  # "raw" - кадр без PNG, "raw_gzip" - со сжатием gzip, "auto" - быстрейший, "png"
         },
         "bot": {
             "battle_timeout": 120,
@@ -36,6 +43,35 @@ class Config:
             "check_interval": 3,
             "debug_mode": False,  # Выключен режим отладки
         },
+        "capture": {
+            "background_grabber": False,  # Фоновый поток захвата кадров
+            "max_fps": 5,  # Максимальная частота захвата
+            "buffer_size": 3,  # Количество последних кадров в буфере
+            "max_frame_age": 1.0,  # Максимальный возраст кадра для обработчиков (сек)
+            "idle_timeout": 5,  # Пауза захвата, если кадры никто не запрашивает (сек)
+        },
+        "matching": {
+            "regions": {},  # Область поиска шаблона: {"victory.png": [x, y, ширина, высота]}
+            "roi_max_misses": 3,  # Промахов в области до поиска по всему кадру
+            "mode": "full",  # "full" - полное разрешение, "pyramid" - грубый поиск на уменьшенном кадре
+            "pyramid_scale": 0.5,  # Масштаб грубого прохода (0.5 или 0.25)
+            "pyramid_tolerance": 0.1,  # Допуск грубой оценки ниже порога для проверки кандидата
+            "default_space": "color",  # Пространство сопоставления: color, gray, blue, green, red
+            "spaces": {},  # Пространство для отдельных шаблонов: {"victory.png": "gray"}
+            "template_cache": True,  # Кеш подготовленных шаблонов на диске (в папке лицензии)
+            "screen_index": "resources/screen_index.json",  # Индекс классификатора экранов (tools/build_screen_index.py)
+            "screen_max_distance": 10,  # Макс. расстояние Хэмминга до эталонного экрана
+            "learn_transitions": True,  # Порядок проверки шаблонов по статистике переходов между экранами
+            "change_detection": True,  # Повторно использовать результат, если область кадра не изменилась
+            "change_threshold": 8,  # Макс. разница пикселей уменьшенного кадра (0-255), считающаяся без изменений
+            "location_priors": True,  # Сначала проверять шаблон на его последней найденной позиции
+            "pixel_probes": False,  # Определять известные экраны по цветам нескольких пикселей без сопоставления
+            "max_workers": 0,  # Потоков параллельного сопоставления (0 - авто, до 8 в пределах доли ядер бота)
+            "cv_threads": None,  # Потоков OpenCV на один вызов (None - 1 при нескольких потоках сопоставления)
+            "bots_per_host": 1,  # Сколько ботов запущено на машине - ядра делятся между ними
+            "reference_resolution": [1600, 900],  # Разрешение, в котором сделаны шаблоны и координаты нажатий
+            "cache_size": 256,  # Результатов в кеше по отпечатку кадра (0 - без кеша)
+        },
         "license": {
             "directory": os.path.join(os.path.expanduser("~"), ".AOM_Bot"),
         },
@@ -0,0 +1,323 @@
+import uuid
+import socket
+import struct
+import logging
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+
+class AdbProtocolError(Exception):
+    """Raised when the adb server rejects a request or breaks the protocol."""
+
+
+class AdbSocketClient:
+    """
+    Minimal client for the adb server smart-socket protocol (tcp:5037).
+
+    Requests are sent directly to the local adb server instead of spawning the
+    adb executable. One-shot services (`exec:`, `shell:`) consume their stream,
+    so the client keeps a per-device pool of connections that are already
+    switched to the device transport, and reuses `sync:` connections across
+    file transfers.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 5037,
+                 timeout: float = 5, pool_size: int = 2):
+        """
+        Args:
+            host: Address of the adb server
+            port: Port of the adb server
+            timeout: Socket timeout in seconds
+            pool_size: Number of idle connections kept per device
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.logger = logging.getLogger("BotLogger")
+
+        self._lock = threading.Lock()
+        self._transport_pool: Dict[str, Deque[socket.socket]] = {}
+        self._sync_pool: Dict[str, Deque[socket.socket]] = {}
+        # Devices with a background prefill in progress
+        self._prefilling: Set[str] = set()
+
+    # ----- low-level protocol -----
+
+    def _connect(self) -> socket.socket:
+        """Opens a new connection to the adb server."""
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    @staticmethod
+    def _recv_exact(sock: socket.socket, size: int) -> bytes:
+        """Reads exactly `size` bytes from the socket."""
+        data = bytearray()
+        while len(data) < size:
+            chunk = sock.recv(size - len(data))
+            if not chunk:
+                raise AdbProtocolError("Соединение с adb сервером закрыто")
+            data.extend(chunk)
+        return bytes(data)
+
+    @staticmethod
+    def _recv_all(sock: socket.socket) -> bytearray:
+        """Reads from the socket until the server closes the stream."""
+        data = bytearray()
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+        return data
+
+    def _request(self, sock: socket.socket, payload: str):
+        """
+        Sends a length-prefixed request and checks the OKAY/FAIL status.
+
+        Raises:
+            AdbProtocolError: if the server answers FAIL or garbage
+        """
+        data = payload.encode("utf-8")
+        sock.sendall(b"%04x" % len(data) + data)
+
+        status = self._recv_exact(sock, 4)
+        if status == b"OKAY":
+            return
+        if status == b"FAIL":
+            raise AdbProtocolError(self._read_string(sock).decode("utf-8", errors="ignore"))
+        raise AdbProtocolError(f"Неожиданный ответ adb сервера: {status!r}")
+
+    def _read_string(self, sock: socket.socket) -> bytes:
+        """Reads a hex4 length-prefixed string."""
+        length = int(self._recv_exact(sock, 4), 16)
+        return self._recv_exact(sock, length)
+
+    # ----- connection pooling -----
+
+    def _open_transport(self, serial: Optional[str]) -> socket.socket:
+        """Opens a connection bound to the device transport."""
+        sock = self._connect()
+        try:
+            self._request(sock, f"host:transport:{serial}" if serial else "host:transport-any")
+        except Exception:
+            sock.close()
+            raise
+        return sock
+
+    def _acquire(self, pool: Dict[str, Deque[socket.socket]], serial: Optional[str]) -> Optional[socket.socket]:
+        """Takes an idle connection from a pool, if any."""
+        with self._lock:
+            idle = pool.get(serial or "")
+            if idle:
+                return idle.popleft()
+        return None
+
+    def _release(self, pool: Dict[str, Deque[socket.socket]], serial: Optional[str], sock: socket.socket):
+        """Returns a connection to a pool or closes it if the pool is full."""
+        with self._lock:
+            idle = pool.setdefault(serial or "", deque())
+            if len(idle) < self.pool_size:
+                idle.append(sock)
+                return
+        sock.close()
+
+    def _start_service(self, serial: Optional[str], service: str) -> socket.socket:
+        """
+        Starts a device service on a pooled transport connection.
+
+        A pooled connection may have gone stale, so a failure on it is retried
+        once on a fresh connection. The pool is then topped up in the
+        background, while the caller reads the service output.
+        """
+        sock = self._acquire(self._transport_pool, serial)
+        if sock is not None:
+            try:
+                self._request(sock, service)
+                self._schedule_prefill(serial)
+                return sock
+            except (OSError, AdbProtocolError):
+                sock.close()
+
+        sock = self._open_transport(serial)
+        try:
+            self._request(sock, service)
+        except Exception:
+            sock.close()
+            raise
+        self._schedule_prefill(serial)
+        return sock
+
+    def _schedule_prefill(self, serial: Optional[str]):
+        """Starts a background prefill unless the pool is stocked or one is already running."""
+        key = serial or ""
+        with self._lock:
+            if self._transport_pool.get(key) or key in self._prefilling:
+                return
+            self._prefilling.add(key)
+        threading.Thread(target=self._prefill, args=(serial,), daemon=True).start()
+
+    def _prefill(self, serial: Optional[str]):
+        """Keeps one transport-bound connection ready for the next command."""
+        try:
+            self._release(self._transport_pool, serial, self._open_transport(serial))
+        except (OSError, AdbProtocolError):
+            pass
+        finally:
+            with self._lock:
+                self._prefilling.discard(serial or "")
+
+    def close(self):
+        """Closes all pooled connections."""
+        with self._lock:
+            pools = list(self._transport_pool.values()) + list(self._sync_pool.values())
+            self._transport_pool.clear()
+            self._sync_pool.clear()
+        for idle in pools:
+            for sock in idle:
+                try:
+                    sock.close()
+                except OSError:
+                    pass
+
+    # ----- host services -----
+
+    def host_command(self, command: str) -> bytes:
+        """
+        Runs a host service that returns a length-prefixed payload.
+
+        Args:
+            command: Host service, e.g. "host:version" or "host:devices-l"
+
+        Returns:
+            Service payload
+        """
+        sock = self._connect()
+        try:
+            self._request(sock, command)
+            return self._read_string(sock)
+        finally:
+            sock.close()
+
+    def devices(self) -> List[Tuple[str, str]]:
+        """
+        Lists devices known to the adb server.
+
+        Returns:
+            List of (serial, state) pairs
+        """
+        output = self.host_command("host:devices").decode("utf-8", errors="ignore")
+        devices = []
+        for line in output.splitlines():
+            parts = line.split()
+            if len(parts) >= 2:
+                devices.append((parts[0], parts[1]))
+        return devices
+
+    # ----- device services -----
+
+    def exec_out(self, serial: Optional[str], command: str, timeout: Optional[float] = None) -> bytearray:
+        """
+        Runs a command through the raw `exec:` service.
+
+        Args:
+            serial: Device serial or None for the only connected device
+            command: Shell command line
+            timeout: Read timeout in seconds (defaults to the client timeout)
+
+        Returns:
+            Binary-clean command output
+        """
+        sock = self._start_service(serial, f"exec:{command}")
+        try:
+            sock.settimeout(timeout or self.timeout)
+            return self._recv_all(sock)
+        finally:
+            sock.close()
+
+    def shell(self, serial: Optional[str], command: str) -> bytearray:
+        """Runs a command through the `shell:` service and returns its output."""
+        sock = self._start_service(serial, f"shell:{command}")
+        try:
+            return self._recv_all(sock)
+        finally:
+            sock.close()
+
+    def run(self, serial: Optional[str], command: str, timeout: Optional[float] = None) -> Tuple[int, bytearray]:
+        """
+        Runs a command and returns its exit code together with its output.
+
+        Mirrors AdbShellSession.run so both channels are interchangeable.
+
+        Args:
+            serial: Device serial or None for the only connected device
+            command: Shell command line
+            timeout: Read timeout in seconds (defaults to the client timeout)
+
+        Returns:
+            (exit_code, stdout)
+        """
+        marker = f"__ADB_DONE_{uuid.uuid4().hex}_".encode()
+        output = self.exec_out(serial, f"{{ {command}; }} 2>/dev/null; echo {marker.decode()}$?", timeout)
+
+        marker_pos = output.rfind(marker)
+        if marker_pos < 0:
+            raise AdbProtocolError("Команда не вернула код завершения")
+        try:
+            exit_code = int(output[marker_pos + len(marker):].strip())
+        except ValueError:
+            exit_code = -1
+        # Отрезаем маркер на месте, без копирования всего вывода
+        del output[marker_pos:]
+        return exit_code, output
+
+    def pull(self, serial: Optional[str], remote_path: str) -> bytes:
+        """
+        Reads a file from the device with the sync protocol.
+
+        Sync connections stay open after a transfer and are reused.
+
+        Args:
+            serial: Device serial or None for the only connected device
+            remote_path: Absolute path of the file on the device
+
+        Returns:
+            File contents
+        """
+        sock = self._acquire(self._sync_pool, serial)
+        if sock is None:
+            sock = self._open_transport(serial)
+            try:
+                self._request(sock, "sync:")
+            except Exception:
+                sock.close()
+                raise
+
+        try:
+            path = remote_path.encode("utf-8")
+            sock.sendall(b"RECV" + struct.pack("<I", len(path)) + path)
+
+            chunks = []
+            while True:
+                chunk_id, length = struct.unpack("<4sI", self._recv_exact(sock, 8))
+                if chunk_id == b"DATA":
+                    chunks.append(self._recv_exact(sock, length))
+                elif chunk_id == b"DONE":
+                    break
+                elif chunk_id == b"FAIL":
+                    # Ошибка передачи файла не ломает sync-соединение
+                    message = self._recv_exact(sock, length).decode("utf-8", errors="ignore")
+                    self._release(self._sync_pool, serial, sock)
+                    sock = None
+                    raise AdbProtocolError(message)
+                else:
+                    raise AdbProtocolError(f"Неожиданный ответ sync: {chunk_id!r}")
+        except Exception:
+            if sock is not None:
+                sock.close()
+            raise
+
+        self._release(self._sync_pool, serial, sock)
+        return b"".join(chunks)
@@ -1,15 +1,110 @@
 import os
+import re
+import time
+import zlib
+import struct
 import subprocess
 import random
 import logging
-from typing import Tuple, Optional
+import cv2
+import numpy as np
+from typing import Dict, List, Tuple, Optional, Union
 
+from core.adb_client import AdbSocketClient, AdbProtocolError
+from core.adb_shell import AdbShellSession
+from core.touch_injector import TouchInjector, parse_wm_size
+
+
+# Android PixelFormat values reported in the raw screencap header
+RAW_PIXEL_FORMATS = {
+    1: cv2.COLOR_RGBA2BGR,  # RGBA_8888
+    2: cv2.COLOR_RGBA2BGR,  # RGBX_8888
+    5: cv2.COLOR_BGRA2BGR,  # BGRA_8888
+}
+
+# Smallest screencap output accepted as a frame
+MIN_CAPTURE_SIZE = 100
+# Largest random offset added to tap coordinates
+TAP_JITTER = 5
+# adb output that means the client or device does not know `exec-out`
+# (older clients print their usage text for unknown commands)
+EXEC_OUT_UNSUPPORTED = re.compile(rb"unknown command|usage:|Android Debug Bridge", re.IGNORECASE)
+
+
+def parse_devices(output: str) -> List[Dict[str, str]]:
+    """
+    Parses the output of `adb devices -l`.
+
+    Args:
+        output: Text printed by `adb devices` or `adb devices -l`
+
+    Returns:
+        List of dicts with "serial", "state" and the key:value properties
+        (product, model, device, transport_id) of every listed device
+    """
+    devices = []
+    for line in output.splitlines():
+        line = line.strip()
+        if not line or line.startswith("List of devices") or line.startswith("*"):
+            continue
+
+        parts = line.split()
+        if len(parts) < 2:
+            continue
+
+        device = {"serial": parts[0], "state": parts[1]}
+        for prop in parts[2:]:
+            if ":" in prop:
+                key, value = prop.split(":", 1)
+                device[key] = value
+        devices.append(device)
+    return devices
 
-class AdbController:
-    """Handles communication with the Android device via ADB."""
 
-    def __init__(self, adb_path: str):
+def decode_raw_screencap(data: bytes) -> Optional[np.ndarray]:
+    """
+    Parses the output of `screencap` without `-p`.
+
+    The frame starts with a little-endian header: width, height, pixel format
+    and, on Android 9+, a colour space field (12 or 16 bytes in total),
+    followed by width * height 4-byte pixels.
+
+    Args:
+        data: Raw screencap output
+
+    Returns:
+        BGR image as NumPy array or None if the data is not a supported raw frame
+    """
+    if data is None or len(data) < 12:
+        return None
+
+    width, height, pixel_format = struct.unpack_from("<III", data, 0)
+    conversion = RAW_PIXEL_FORMATS.get(pixel_format)
+    pixels_size = width * height * 4
+    header_size = len(data) - pixels_size
+    if conversion is None or width == 0 or height == 0 or header_size not in (12, 16):
+        return None
+
+    rgba = np.frombuffer(data, dtype=np.uint8, count=pixels_size, offset=header_size)
+    return cv2.cvtColor(rgba.reshape(height, width, 4), conversion)
+
+
+class AdbControllerBase:
+    """
+    Device addressing, tap and capture decisions shared by AdbController and
+    AsyncAdbController; the subclasses only differ in how commands are run.
+    """
+
+    def __init__(self, adb_path: str, capture_mode: str = "png", serial: Optional[str] = None):
+        """
+        Args:
+            adb_path: Path to the adb executable
+            capture_mode: Capture mode, see the subclasses for supported values
+            serial: Serial of the target device, None for the only connected device
+        """
         self.adb_path = adb_path
+        self.serial = serial or None
+        self.capture_mode = capture_mode
         self.logger = logging.getLogger("BotLogger")
 
         # Set creation flags based on OS
@@ -17,36 +112,252 @@ class AdbController:
         if os.name == 'nt':
             self.creation_flags = subprocess.CREATE_NO_WINDOW
 
-    def check_connection(self) -> bool:
-        """Checks if ADB is connected to a device."""
+    def _adb_base(self) -> List[str]:
+        """Returns the adb command prefix bound to the target device."""
+        if self.serial:
+            return [self.adb_path, "-s", self.serial]
+        return [self.adb_path]
+
+    def _devices_command(self) -> List[str]:
+        """Returns the command that lists devices known to the adb server."""
+        return [self.adb_path, "devices", "-l"]
+
+    def _jitter(self, x: int, y: int) -> Tuple[int, int]:
+        """Adds a small random offset to tap coordinates."""
+        return x + random.randint(-TAP_JITTER, TAP_JITTER), y + random.randint(-TAP_JITTER, TAP_JITTER)
+
+    def _tap_command(self, x: int, y: int) -> str:
+        """Returns the device-side command for a tap."""
+        return f"input tap {x} {y}"
+
+    def _target_online(self, devices: List[Dict[str, str]]) -> bool:
+        """
+        Decides from a parsed device list whether the target device is online.
+
+        Without a serial any single online device is accepted; several online
+        devices are accepted with a warning, since commands are then ambiguous.
+        """
+        online = [d for d in devices if d["state"] == "device"]
+        if self.serial:
+            if any(d["serial"] == self.serial for d in online):
+                self.logger.info(f"✅ ADB подключение успешно. Устройство {self.serial} найдено.")
+                return True
+            self.logger.info(f"🚨 Устройство {self.serial} не подключено.")
+            return False
+
+        if not online:
+            self.logger.info("🚨 ADB не обнаружил устройство.")
+            return False
+        if len(online) > 1:
+            self.logger.warning(
+                f"⚠ Подключено несколько устройств ({len(online)}), но серийный номер не задан - "
+                f"команды adb будут неоднозначными")
+        self.logger.info("✅ ADB подключение успешно. Устройство найдено.")
+        return True
+
+    def _decode_raw_frame(self, raw_data) -> Optional[np.ndarray]:
+        """
+        Decodes a raw screencap frame.
+
+        If the frame cannot be parsed (e.g. an RGB_565 framebuffer) the device
+        is switched to PNG capture for good, since every later frame would
+        fail the same way.
+
+        Returns:
+            BGR image or None if the frame is not supported
+        """
+        screen_img = decode_raw_screencap(raw_data)
+        if screen_img is None:
+            pixel_format = struct.unpack_from("<I", raw_data, 8)[0] if len(raw_data) >= 12 else None
+            self.logger.warning(
+                f"⚠ Не удалось разобрать сырой кадр screencap (формат {pixel_format}, "
+                f"{len(raw_data)} байт), устройство переключено на захват PNG")
+            self.capture_mode = "png"
+        return screen_img
+
+
+class AdbController(AdbControllerBase):
+    """Handles communication with the Android device via ADB."""
+
+    # Captures per transport before "auto" capture mode starts comparing them
+    TRANSPORT_WARMUP_SAMPLES = 3
+    # Every N captures the slower raw transport is measured again
+    TRANSPORT_PROBE_INTERVAL = 100
+    # A failed capture counts as a sample this slow (the capture timeout)
+    TRANSPORT_FAILURE_TIME = 5.0
+    # Consecutive failures after which a raw transport is no longer used
+    TRANSPORT_MAX_FAILURES = 3
+
+    def __init__(self, adb_path: str, persistent_shell: bool = False, capture_mode: str = "png",
+                 socket_client: bool = False, tap_backend: str = "input", serial: Optional[str] = None,
+                 server_host: str = "127.0.0.1", server_port: int = 5037):
+        """
+        Args:
+            adb_path: Path to the adb executable
+            persistent_shell: If True, taps and captures go through one long-lived
+                `adb shell` channel; per-call subprocesses are used as a fallback
+            capture_mode: "png" for `screencap -p` bytes, "raw" for an
+                uncompressed framebuffer returned as a BGR NumPy array, "raw_gzip"
+                for a raw frame gzip-compressed on the device, or "auto" to pick
+                the faster raw transport by measurement
+            socket_client: If True, device commands are sent straight to the adb
+                server instead of through the adb executable
+            tap_backend: "input" for `input tap` or "sendevent" for raw touch
+                events written to the touchscreen input node
+            serial: Serial of the target device; every command is sent with
+                `-s <serial>`. None targets the only connected device
+            server_host: Address of the adb server used by the socket client
+            server_port: Port of the adb server used by the socket client
+        """
+        super().__init__(adb_path, capture_mode, serial)
+        self.tap_backend = tap_backend
+
+        # Persistent shell session (started lazily on first command)
+        self.shell_session: Optional[AdbShellSession] = None
+        if persistent_shell:
+            self.shell_session = AdbShellSession(self._adb_base(), self.creation_flags)
+
+        # Direct adb server client with pooled connections
+        self.socket_client: Optional[AdbSocketClient] = None
+        if socket_client:
+            self.socket_client = AdbSocketClient(server_host, server_port)
+
+        # Raw capture transport measurements for "auto" mode: name -> (avg seconds, samples)
+        self._capture_stats: Dict[str, Tuple[float, int]] = {"raw": (0.0, 0), "raw_gzip": (0.0, 0)}
+        self._captures_since_probe = 0
+        self._gzip_supported: Optional[bool] = None
+        # Consecutive failed captures per raw transport
+        self._capture_failures: Dict[str, int] = {"raw": 0, "raw_gzip": 0}
+        # Capture transport detection, done once per device
+        self._exec_out_supported: Optional[bool] = None
+        self._crlf_translation: Optional[bool] = None
+        # Size of the last decompressed frame, used as the output buffer size of the next one
+        self._raw_frame_size = 0
+
+        # Raw touch event backend; touchscreen geometry is probed on first tap
+        self.touch_injector = TouchInjector(self._run_shell)
+        # Display size from `wm size`, queried once per device
+        self._screen_size: Optional[Tuple[int, int]] = None
+
+    def close(self):
+        """Closes the persistent shell session and pooled server connections."""
+        if self.shell_session:
+            self.shell_session.close()
+        if self.socket_client:
+            self.socket_client.close()
+
+    def _run_in_session(self, command: str, timeout: float = 5) -> Optional[Tuple[int, bytes]]:
+        """
+        Runs a shell command without starting an adb process.
+
+        The adb server socket is tried first, then the persistent shell session.
+
+        Returns:
+            (exit_code, stdout) or None if no fast channel is available
+        """
+        if self.socket_client is not None:
+            try:
+                return self.socket_client.run(self.serial, command, timeout=timeout)
+            except (OSError, AdbProtocolError) as e:
+                self.logger.debug(f"Команда через adb сервер не выполнена: {e}")
+
+        if self.shell_session is None:
+            return None
+        return self.shell_session.run(command, timeout=timeout)
+
+    def _run_shell(self, command: str, timeout: float = 5) -> Optional[Tuple[int, bytes]]:
+        """
+        Runs a shell command through the fastest available channel.
+
+        Falls back to a separate `adb shell` process when no persistent channel
+        is available.
+
+        Returns:
+            (exit_code, stdout) or None if the command could not be run
+        """
+        session_result = self._run_in_session(command, timeout=timeout)
+        if session_result is not None:
+            return session_result
+
         try:
-            self.logger.info(f"Проверка соединения ADB. Путь к ADB: {self.adb_path}")
+            result = subprocess.run(
+                self._adb_base() + ["shell", command],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                timeout=timeout, creationflags=self.creation_flags
+            )
+            return result.returncode, result.stdout
+        except subprocess.TimeoutExpired:
+            self.logger.error(f"🚨 Таймаут ADB при выполнении команды: {command}")
+        except Exception as e:
+            self.logger.error(f"🚨 Ошибка ADB при выполнении команды {command}: {e}")
+        return None
 
+    def _tap_command(self, x: int, y: int) -> str:
+        """
+        Returns the device-side command for a tap with the current backend.
+
+        Falls back to `input tap` when the sendevent backend is unavailable.
+        """
+        if self.tap_backend == "sendevent":
+            command = self.touch_injector.tap_command(x, y)
+            if command:
+                return command
+            self.logger.warning("⚠ Бэкенд sendevent недоступен, используем input tap")
+            self.tap_backend = "input"
+        return super()._tap_command(x, y)
+
+    def frame_captured(self, width: int, height: int):
+        """Reports the size of a captured frame, so the sendevent backend notices display rotation."""
+        if self.tap_backend == "sendevent":
+            self.touch_injector.frame_captured(width, height)
+
+    def screen_size(self) -> Optional[Tuple[int, int]]:
+        """
+        Returns the display size reported by `wm size` (override size if set).
+
+        The result is cached after the first successful query.
+
+        Returns:
+            (width, height) in the device's natural orientation, or None
+        """
+        if self._screen_size is None:
+            result = self._run_shell("wm size", timeout=5)
+            if result and result[0] == 0:
+                self._screen_size = parse_wm_size(result[1].decode("utf-8", errors="ignore"))
+            if self._screen_size:
+                self.logger.info(f"Разрешение экрана устройства: {self._screen_size[0]}x{self._screen_size[1]}")
+            else:
+                self.logger.warning("⚠ Не удалось определить разрешение экрана через wm size")
+        return self._screen_size
+
+    def list_devices(self) -> List[Dict[str, str]]:
+        """
+        Enumerates devices known to the adb server (`adb devices -l`).
+
+        Returns:
+            Parsed device list, empty if adb could not be run
+        """
+        try:
             result = subprocess.run(
-                [self.adb_path, "devices"],
+                self._devices_command(),
                 stdout=subprocess.PIPE, stderr=subprocess.PIPE,
                 timeout=5, creationflags=self.creation_flags
             )
-            output = result.stdout.decode("utf-8")
-            error = result.stderr.decode("utf-8") if result.stderr else ""
-
-            self.logger.info(f"ADB devices вывод: {output}")
+            error = result.stderr.decode("utf-8", errors="ignore") if result.stderr else ""
             if error:
                 self.logger.warning(f"ADB devices ошибка: {error}")
-
-            if "device" in output and "List of devices" in output:
-                # Check if any actual device is listed
-                lines = output.strip().split('\n')
-                if len(lines) > 1:  # More than just the header line
-                    self.logger.info("✅ ADB подключение успешно. Устройство найдено.")
-                    return True
-                else:
-                    self.logger.info("🚨 ADB запущен, но устройства не обнаружены.")
-            else:
-                self.logger.info("🚨 ADB не обнаружил устройство.")
+            return parse_devices(result.stdout.decode("utf-8", errors="ignore"))
         except Exception as e:
-            self.logger.error(f"🚨 Ошибка при проверке подключения adb: {e}")
-        return False
+            self.logger.error(f"🚨 Ошибка при получении списка устройств adb: {e}")
+            return []
+
+    def check_connection(self) -> bool:
+        """Checks if ADB is connected to the target device."""
+        self.logger.info(f"Проверка соединения ADB. Путь к ADB: {self.adb_path}")
+
+        devices = self.list_devices()
+        self.logger.info(f"ADB устройства: {', '.join(d['serial'] + ' (' + d['state'] + ')' for d in devices) or 'нет'}")
+        return self._target_online(devices)
 
     def tap(self, x: int, y: int, add_randomness: bool = True) -> bool:
         """
@@ -61,40 +372,235 @@ class AdbController:
             True if tap was successful, False otherwise
         """
         if add_randomness:
-            x_offset = random.randint(-5, 5)
-            y_offset = random.randint(-5, 5)
-            x += x_offset
-            y += y_offset
+            x, y = self._jitter(x, y)
 
-        try:
-            subprocess.run(
-                [self.adb_path, "shell", "input", "tap", str(x), str(y)],
-                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
-                check=True, timeout=5, creationflags=self.creation_flags
-            )
-            self.logger.info(f"Нажатие отправлено на координаты ({x}, {y})")
-            return True
-        except subprocess.TimeoutExpired:
-            self.logger.error("🚨 Таймаут ADB нажатия: Команда не завершилась вовремя")
-        except subprocess.CalledProcessError as e:
-            self.logger.error(f"🚨 Ошибка ADB нажатия: {e}")
-        except Exception as e:
-            self.logger.error(f"🚨 Непредвиденная ошибка при нажатии: {e}")
+        command = self._tap_command(x, y)
+        result = self._run_shell(command)
+        if result is not None:
+            exit_code, _ = result
+            if exit_code == 0:
+                self.logger.info(f"Нажатие отправлено на координаты ({x}, {y})")
+                return True
+
+            if not command.startswith("input "):
+                self.logger.warning(f"⚠ Ошибка sendevent (код {exit_code}), переключаемся на input tap")
+                self.tap_backend = "input"
+                return self.tap(x, y, add_randomness=False)
+
+            self.logger.error(f"🚨 Ошибка ADB нажатия: код возврата {exit_code}")
         return False
 
-    def capture_screen(self) -> Optional[bytes]:
+    def tap_sequence(self, steps: List[Tuple[int, int, int]], add_randomness: bool = True) -> List[bool]:
+        """
+        Sends several taps with pauses between them in a single ADB round trip.
+
+        The whole sequence runs on the device as one shell script, and each tap
+        reports its own exit status.
+
+        Args:
+            steps: List of (x, y, delay_ms) where delay_ms is the pause after the tap
+            add_randomness: If True, adds small random offsets to coordinates
+
+        Returns:
+            List with the success flag of every tap, in order
+        """
+        if not steps:
+            return []
+
+        commands = []
+        coords = []
+        for index, (x, y, delay_ms) in enumerate(steps):
+            if add_randomness:
+                x, y = self._jitter(x, y)
+            coords.append((x, y))
+            commands.append(f"{self._tap_command(x, y)}; echo TAP{index}:$?")
+            if delay_ms > 0:
+                commands.append(f"sleep {delay_ms / 1000:g}")
+        script = "; ".join(commands)
+
+        # Время на все паузы плюс запас на каждое нажатие
+        timeout = sum(max(0, step[2]) for step in steps) / 1000 + 5 * len(steps)
+
+        result = self._run_shell(script, timeout=timeout)
+        output = result[1] if result is not None else None
+
+        results = [False] * len(steps)
+        if output:
+            for match in re.finditer(rb"TAP(\d+):(\d+)", output):
+                index = int(match.group(1))
+                if index < len(results):
+                    results[index] = int(match.group(2)) == 0
+
+        for (x, y), success in zip(coords, results):
+            if success:
+                self.logger.info(f"Нажатие отправлено на координаты ({x}, {y})")
+            else:
+                self.logger.error(f"🚨 Ошибка ADB нажатия на координаты ({x}, {y})")
+        return results
+
+    def capture_screen(self) -> Optional[Union[bytes, np.ndarray]]:
         """
         Captures the current screen via ADB.
 
+        In "raw" capture mode the framebuffer is pulled without PNG encoding and
+        returned as a BGR NumPy array; "raw_gzip" additionally compresses it on
+        the device for slow (adb over TCP) links, and "auto" picks whichever of
+        the two is faster on this link. If a raw frame cannot be parsed (e.g. an
+        RGB_565 framebuffer) the device is switched to PNG capture for good.
+
         Returns:
-            Raw screen data as bytes or None if failed
+            BGR image (raw modes) or PNG bytes (png mode), None if failed
         """
+        if self.capture_mode in ("raw", "raw_gzip", "auto"):
+            transport = self._select_raw_transport()
+            started = time.time()
+
+            if transport == "raw_gzip":
+                # Заголовок и контрольная сумма gzip занимают 18 байт
+                raw_data = self._capture_bytes("screencap | gzip -1", binary_safe=True, min_size=20)
+                transferred = len(raw_data) if raw_data is not None else 0
+                raw_data = self._gunzip_frame(raw_data) if raw_data is not None else None
+            else:
+                raw_data = self._capture_bytes("screencap", binary_safe=True)
+                transferred = len(raw_data) if raw_data is not None else 0
+
+            if raw_data is None:
+                self._record_capture_failure(transport)
+            else:
+                screen_img = self._decode_raw_frame(raw_data)
+                if screen_img is not None:
+                    self._record_capture_time(transport, time.time() - started, transferred)
+                    return screen_img
+
+        return self._capture_bytes("screencap -p")
+
+    def _gzip_available(self) -> bool:
+        """Checks once whether the device can gzip-compress frames."""
+        if self._gzip_supported is None:
+            result = self._run_shell("echo ok | gzip -1 | gzip -d")
+            self._gzip_supported = result is not None and result[1].strip() == b"ok"
+            if not self._gzip_supported:
+                self.logger.info("На устройстве нет gzip, сжатие кадров недоступно")
+        return self._gzip_supported
+
+    def _select_raw_transport(self) -> str:
+        """
+        Chooses between uncompressed and gzip-compressed raw capture.
+
+        In "auto" mode each transport is measured a few times, then the one with
+        the lowest average capture time wins; the other one is re-measured
+        periodically in case the link speed changes. Failed captures count as
+        slow samples, and gzip capture that keeps failing is dropped.
+        """
+        if self.capture_mode == "raw":
+            return "raw"
+        if not self._gzip_available():
+            return "raw"
+        if self._capture_failures["raw_gzip"] >= self.TRANSPORT_MAX_FAILURES:
+            return "raw"
+        if self.capture_mode == "raw_gzip":
+            return "raw_gzip"
+
+        self._captures_since_probe += 1
+        for transport, (avg_time, samples) in self._capture_stats.items():
+            if samples < self.TRANSPORT_WARMUP_SAMPLES:
+                return transport
+
+        best = min(self._capture_stats, key=lambda name: self._capture_stats[name][0])
+        if self._captures_since_probe >= self.TRANSPORT_PROBE_INTERVAL:
+            self._captures_since_probe = 0
+            return "raw" if best == "raw_gzip" else "raw_gzip"
+        return best
+
+    def _record_capture_time(self, transport: str, elapsed: float, transferred: int):
+        """Updates the moving average capture time of a raw transport."""
+        self._capture_failures[transport] = 0
+        self._add_capture_sample(transport, elapsed)
+
+        if elapsed > 0:
+            self.logger.debug(
+                f"Захват ({transport}): {elapsed * 1000:.0f} мс, "
+                f"{transferred / 1024:.0f} КБ, {transferred / elapsed / 1048576:.1f} МБ/с")
+
+    def _record_capture_failure(self, transport: str):
+        """Counts a failed capture against a raw transport."""
+        self._capture_failures[transport] += 1
+        self._add_capture_sample(transport, self.TRANSPORT_FAILURE_TIME)
+        if transport == "raw_gzip" and self._capture_failures[transport] == self.TRANSPORT_MAX_FAILURES:
+            self.logger.warning("⚠ Сжатый захват кадров постоянно завершается ошибкой, используем несжатый")
+
+    def _add_capture_sample(self, transport: str, elapsed: float):
+        """Adds a capture time to the moving average of a raw transport."""
+        avg_time, samples = self._capture_stats[transport]
+        avg_time = elapsed if samples == 0 else avg_time * 0.8 + elapsed * 0.2
+        self._capture_stats[transport] = (avg_time, samples + 1)
+
+    def _gunzip_frame(self, data: bytes) -> Optional[bytes]:
+        """
+        Decompresses a gzip-compressed raw frame.
+
+        The whole stream is already in memory, so it is inflated in one call;
+        the output buffer starts at the previous frame's size (w * h * 4 plus
+        the header), so a same-sized frame is inflated without reallocation.
+
+        Returns:
+            Decompressed frame or None if the stream is broken or truncated
+        """
+        try:
+            frame = zlib.decompress(data, 16 + zlib.MAX_WBITS, self._raw_frame_size or zlib.DEF_BUF_SIZE)
+        except zlib.error as e:
+            self.logger.error(f"🚨 Ошибка распаковки сжатого кадра: {e}")
+            return None
+        self._raw_frame_size = len(frame)
+        return frame
+
+    def _repair_crlf(self, screen_data: bytes) -> bytes:
+        """
+        Undoes PTY newline translation of `adb shell` output when the device does it.
+
+        Whether translation happens is detected once from the PNG signature
+        and cached, so devices without a PTY never pay for the full-buffer rewrite.
+        """
+        if self._crlf_translation is None:
+            self._crlf_translation = screen_data.startswith(b"\x89PNG\r\r\n")
+            self.logger.debug(f"Преобразование CRLF в adb shell: {'да' if self._crlf_translation else 'нет'}")
+
+        if self._crlf_translation:
+            return screen_data.replace(b'\r\n', b'\n')
+        return screen_data
+
+    def _capture_bytes(self, command: str, binary_safe: bool = False,
+                       min_size: int = MIN_CAPTURE_SIZE) -> Optional[bytes]:
+        """
+        Runs a screencap command and returns its output.
+
+        Args:
+            command: Device-side capture command (e.g. "screencap -p")
+            binary_safe: If True, the fallback subprocess always uses `exec-out`.
+                Otherwise `exec-out` is tried first and `adb shell` is used on
+                devices without it, with CRLF repair only where detected
+            min_size: Smallest output size accepted as a valid capture
+
+        Returns:
+            Captured bytes or None if failed
+        """
+        session_result = self._run_in_session(command)
+        if session_result is not None:
+            exit_code, screen_data = session_result
+            if exit_code == 0 and len(screen_data) >= min_size:
+                self.logger.debug(f"Захват экрана через сессию успешен, размер данных: {len(screen_data)} байт")
+                return screen_data
+            self.logger.warning(
+                f"⚠ Некорректный захват экрана через сессию (код {exit_code}, {len(screen_data)} байт), "
+                f"используем отдельный процесс")
+
         for attempt in range(3):
+            transport = "exec-out" if binary_safe or self._exec_out_supported is not False else "shell"
             try:
-                self.logger.debug(f"Попытка захвата экрана #{attempt + 1}")
+                self.logger.debug(f"Попытка захвата экрана #{attempt + 1} ({transport})")
 
                 process = subprocess.Popen(
-                    [self.adb_path, "shell", "screencap", "-p"],
+                    self._adb_base() + [transport] + command.split(),
                     stdout=subprocess.PIPE, stderr=subprocess.PIPE,
                     creationflags=self.creation_flags
                 )
@@ -106,9 +612,15 @@ class AdbController:
                         stderr_text = stderr.decode('utf-8', errors='ignore')
                         self.logger.warning(f"Предупреждение при захвате экрана: {stderr_text}")
 
-                    if not screen_data or len(screen_data) < 100:  # Слишком маленький размер для валидного изображения
+                    if not screen_data or len(screen_data) < min_size:  # Слишком маленький размер для валидного изображения
                         self.logger.error(
                             f"Получены некорректные данные экрана, размер: {len(screen_data) if screen_data else 0} байт")
+                        # Пустой вывод бывает и при временном отключении устройства - отказываемся
+                        # от exec-out, только если adb сам отверг команду
+                        if (transport == "exec-out" and not binary_safe and self._exec_out_supported is None
+                                and process.returncode != 0 and EXEC_OUT_UNSUPPORTED.search(stderr or b"")):
+                            self.logger.info("adb exec-out не поддерживается, захват через adb shell")
+                            self._exec_out_supported = False
                         continue
 
                 except subprocess.TimeoutExpired:
@@ -117,7 +629,10 @@ class AdbController:
                     self.logger.error(f"🚨 Таймаут при захвате экрана (попытка {attempt + 1})")
                     continue
 
-                screen_data = screen_data.replace(b'\r\n', b'\n')
+                if transport == "exec-out":
+                    self._exec_out_supported = True
+                else:
+                    screen_data = self._repair_crlf(screen_data)
 
                 self.logger.debug(f"Захват экрана успешен, размер данных: {len(screen_data)} байт")
                 return screen_data
@@ -130,4 +645,4 @@ class AdbController:
             time.sleep(1)
 
         self.logger.error("🚨 Ошибка: Не удалось загрузить изображение из ADB после нескольких попыток.")
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,200 @@
+import time
+import uuid
+import logging
+import threading
+import subprocess
+from typing import List, Optional, Tuple
+
+
+class AdbShellSession:
+    """
+    Long-lived `adb shell` channel to a single device.
+
+    Commands are written to the stdin of one persistent `adb shell` process and
+    their output is read back up to a unique end marker, so no new adb client
+    process is started per command. The session restarts itself when the
+    channel dies; callers fall back to per-call subprocesses when it is unusable.
+    After a failed start the next attempt waits, with the pause doubling up to
+    RESTART_MAX_DELAY, so a rebooting emulator does not cost a start per command.
+    """
+
+    # Пауза перед повторным запуском канала после неудачи и ее верхняя граница (секунды)
+    RESTART_DELAY = 1.0
+    RESTART_MAX_DELAY = 60.0
+
+    def __init__(self, adb_cmd: List[str], creation_flags: int = 0):
+        """
+        Args:
+            adb_cmd: Base adb command line (e.g. ["adb"]) used to spawn the shell
+            creation_flags: Process creation flags passed to subprocess.Popen
+        """
+        self.adb_cmd = list(adb_cmd)
+        self.creation_flags = creation_flags
+        self.logger = logging.getLogger("BotLogger")
+
+        self._process: Optional[subprocess.Popen] = None
+        self._reader: Optional[threading.Thread] = None
+        self._buffer = bytearray()
+        self._eof = False
+        self._cond = threading.Condition()
+        self._lock = threading.Lock()
+        self._failed_restarts = 0
+        self._next_restart = 0.0
+
+    def is_alive(self) -> bool:
+        """Returns True if the underlying shell process is running."""
+        return self._process is not None and self._process.poll() is None and not self._eof
+
+    def start(self) -> bool:
+        """
+        Starts the shell process and verifies that the channel is binary-clean.
+
+        Returns:
+            True if the session is ready for commands, False otherwise
+        """
+        self.close()
+        try:
+            self._process = subprocess.Popen(
+                self.adb_cmd + ["shell"],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                creationflags=self.creation_flags
+            )
+        except Exception as e:
+            self.logger.error(f"🚨 Не удалось запустить постоянную сессию adb shell: {e}")
+            self._process = None
+            return False
+
+        with self._cond:
+            self._buffer.clear()
+            self._eof = False
+        self._reader = threading.Thread(target=self._read_loop, args=(self._process,), daemon=True)
+        self._reader.start()
+
+        # Старые версии adb выделяют PTY: эхо команд и \r\n ломают бинарный вывод
+        result = self._execute("echo ok", timeout=5)
+        if result is None or result[1] != b"ok\n":
+            self.logger.warning("⚠ Канал adb shell не прозрачен для бинарных данных, сессия отключена")
+            self.close()
+            return False
+
+        self.logger.debug("Постоянная сессия adb shell запущена")
+        return True
+
+    def close(self):
+        """Terminates the shell process."""
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            if process.stdin:
+                process.stdin.close()
+        except Exception:
+            pass
+        try:
+            process.kill()
+            process.wait(timeout=2)
+        except Exception:
+            pass
+
+    def run(self, command: str, timeout: float = 5) -> Optional[Tuple[int, bytes]]:
+        """
+        Runs a command through the persistent shell, restarting it if needed.
+
+        Args:
+            command: Shell command to execute on the device
+            timeout: Maximum wait time for the command output in seconds
+
+        Returns:
+            (exit_code, stdout) or None if the session is unusable
+        """
+        with self._lock:
+            if not self.is_alive():
+                now = time.monotonic()
+                if now < self._next_restart:
+                    return None
+                if not self.start():
+                    delay = min(self.RESTART_MAX_DELAY, self.RESTART_DELAY * 2 ** self._failed_restarts)
+                    self._failed_restarts += 1
+                    self._next_restart = now + delay
+                    self.logger.debug(f"Повторный запуск сессии adb shell через {delay:.0f} с")
+                    return None
+                self._failed_restarts = 0
+
+            result = self._execute(command, timeout)
+            if result is None:
+                # Состояние потока неизвестно - перезапустим канал при следующем вызове
+                self.close()
+            return result
+
+    def _execute(self, command: str, timeout: float) -> Optional[Tuple[int, bytes]]:
+        """Writes a command followed by an end marker and waits for its output."""
+        marker = f"__ADB_DONE_{uuid.uuid4().hex}_".encode()
+        line = f"{{ {command}; }} 2>/dev/null; echo {marker.decode()}$?\n".encode()
+
+        try:
+            self._process.stdin.write(line)
+            self._process.stdin.flush()
+        except Exception as e:
+            self.logger.warning(f"⚠ Канал adb shell закрыт: {e}")
+            return None
+
+        # Каждая проверка ищет только в новых данных: scan_pos - начало непросмотренной
+        # части (с запасом на маркер, пришедший частично), marker_pos - найденный маркер
+        scan_pos = 0
+        marker_pos = -1
+        end_pos = -1
+
+        def output_complete() -> bool:
+            nonlocal scan_pos, marker_pos, end_pos
+            if self._eof:
+                return True
+            if marker_pos < 0:
+                marker_pos = self._buffer.find(marker, scan_pos)
+                if marker_pos < 0:
+                    scan_pos = max(0, len(self._buffer) - len(marker) + 1)
+                    return False
+                scan_pos = marker_pos + len(marker)
+            end_pos = self._buffer.find(b"\n", scan_pos)
+            if end_pos < 0:
+                scan_pos = len(self._buffer)
+                return False
+            return True
+
+        with self._cond:
+            found = self._cond.wait_for(output_complete, timeout=timeout)
+            if not found or self._eof:
+                self.logger.warning(f"⚠ Нет ответа от сессии adb shell на команду: {command}")
+                return None
+
+            with memoryview(self._buffer) as view:
+                output = bytes(view[:marker_pos])
+            status = self._buffer[marker_pos + len(marker):end_pos]
+            del self._buffer[:end_pos + 1]
+
+        try:
+            exit_code = int(status)
+        except ValueError:
+            exit_code = -1
+        return exit_code, output
+
+    def _read_loop(self, process: subprocess.Popen):
+        """Reads shell output into the shared buffer until the channel closes."""
+        stream = process.stdout
+        try:
+            while True:
+                chunk = stream.read1(65536)
+                if not chunk:
+                    break
+                if process is not self._process:
+                    break
+                with self._cond:
+                    self._buffer.extend(chunk)
+                    self._cond.notify_all()
+        except Exception:
+            pass
+        finally:
+            with self._cond:
+                # Не затираем состояние нового процесса после перезапуска
+                if process is self._process or self._process is None:
+                    self._eof = True
+                self._cond.notify_all()
@@ -0,0 +1,132 @@
+import asyncio
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+from core.adb_controller import AdbControllerBase, MIN_CAPTURE_SIZE, parse_devices
+
+
+class AsyncAdbController(AdbControllerBase):
+    """
+    Asyncio counterpart of AdbController.
+
+    Commands are started with asyncio.create_subprocess_exec, so a single event
+    loop can drive many emulators without a thread per device. Device
+    addressing, tap commands, connection checks and raw frame decoding come
+    from AdbControllerBase, shared with the synchronous AdbController, which
+    stays the interface used by BotEngine.
+    """
+
+    def __init__(self, adb_path: str, capture_mode: str = "png", serial: Optional[str] = None):
+        """
+        Args:
+            adb_path: Path to the adb executable
+            capture_mode: "png" for `screencap -p` bytes or "raw" for an
+                uncompressed framebuffer returned as a BGR NumPy array
+            serial: Serial of the target device, None for the only connected device
+        """
+        super().__init__(adb_path, capture_mode, serial)
+
+    async def _exec(self, *args: str, timeout: float = 5) -> Optional[Tuple[int, bytes, bytes]]:
+        """
+        Runs adb with the given arguments, bound to the target device.
+
+        Returns:
+            (return_code, stdout, stderr) or None on timeout
+        """
+        return await self._run(self._adb_base() + list(args), timeout=timeout)
+
+    async def _run(self, command: List[str], timeout: float = 5) -> Optional[Tuple[int, bytes, bytes]]:
+        """
+        Runs a command line.
+
+        Returns:
+            (return_code, stdout, stderr) or None on timeout
+        """
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            creationflags=self.creation_flags
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            return None
+        return process.returncode, stdout, stderr
+
+    async def check_connection(self) -> bool:
+        """Checks if ADB is connected to the target device."""
+        try:
+            result = await self._run(self._devices_command())
+            if result is None:
+                self.logger.error("🚨 Таймаут при проверке подключения adb")
+                return False
+            return self._target_online(parse_devices(result[1].decode("utf-8", errors="ignore")))
+        except Exception as e:
+            self.logger.error(f"🚨 Ошибка при проверке подключения adb: {e}")
+        return False
+
+    async def tap(self, x: int, y: int, add_randomness: bool = True) -> bool:
+        """
+        Send a tap command to the device.
+
+        Args:
+            x: X coordinate
+            y: Y coordinate
+            add_randomness: If True, adds small random offsets to coordinates
+
+        Returns:
+            True if tap was successful, False otherwise
+        """
+        if add_randomness:
+            x, y = self._jitter(x, y)
+
+        try:
+            result = await self._exec("shell", self._tap_command(x, y))
+            if result is None:
+                self.logger.error("🚨 Таймаут ADB нажатия: Команда не завершилась вовремя")
+                return False
+            if result[0] != 0:
+                self.logger.error(f"🚨 Ошибка ADB нажатия: код возврата {result[0]}")
+                return False
+            self.logger.info(f"Нажатие отправлено на координаты ({x}, {y})")
+            return True
+        except Exception as e:
+            self.logger.error(f"🚨 Непредвиденная ошибка при нажатии: {e}")
+        return False
+
+    async def capture_screen(self) -> Optional[Union[bytes, np.ndarray]]:
+        """
+        Captures the current screen via `adb exec-out`.
+
+        Returns:
+            BGR image (raw mode) or PNG bytes (png mode), None if failed
+        """
+        for attempt in range(3):
+            raw = self.capture_mode == "raw"
+            try:
+                result = await self._exec("exec-out", *("screencap" if raw else "screencap -p").split())
+                if result is None:
+                    self.logger.error(f"🚨 Таймаут при захвате экрана (попытка {attempt + 1})")
+                else:
+                    screen_data = result[1]
+                    if screen_data and len(screen_data) >= MIN_CAPTURE_SIZE:
+                        if not raw:
+                            return screen_data
+                        screen_img = self._decode_raw_frame(screen_data)
+                        if screen_img is not None:
+                            return screen_img
+                        # Устройство переключено на PNG - повторяем сразу
+                        continue
+                    self.logger.error(
+                        f"Получены некорректные данные экрана, размер: {len(screen_data) if screen_data else 0} байт")
+            except Exception as e:
+                self.logger.error(f"🚨 Ошибка при захвате экрана (попытка {attempt + 1}): {e}")
+
+            # Небольшая задержка перед следующей попыткой
+            await asyncio.sleep(1)
+
+        self.logger.error("🚨 Ошибка: Не удалось загрузить изображение из ADB после нескольких попыток.")
+        return None
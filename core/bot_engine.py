@@ -4,6 +4,8 @@ import threading
 from enum import Enum, auto
 from typing import Dict, Tuple, Optional, List, Callable
 
+from core.frame import Frame
+
 
 class BotState(Enum):
     """Possible states of the bot."""
@@ -21,18 +23,28 @@ class BotState(Enum):
 class BotEngine:
     """Main bot logic and state management."""
 
-    def __init__(self, adb_controller, image_matcher):
+    # Templates that indicate a lost connection to the game server
+    CONNECTION_TEMPLATES = ["waiting_for_server.png", "contact_us.png"]
+
+    def __init__(self, adb_controller, image_matcher, frame_grabber=None):
         self.adb = adb_controller
         self.image_matcher = image_matcher
         self.logger = logging.getLogger("BotLogger")
 
+        # Optional background capture thread (FrameGrabber) for this device
+        self.frame_grabber = frame_grabber
+
         # Event to control the bot thread
         self.running = threading.Event()
 
         # Current state of the bot
         self.state = BotState.IDLE
 
-        # Click coordinates for different actions
+        # Screen the coordinates below refer to; taps are mapped to the device size
+        self.reference_resolution = getattr(image_matcher, "reference_resolution", (1600, 900))
+        self.screen_size: Optional[Tuple[int, int]] = None
+
+        # Click coordinates for different actions (at the reference resolution)
         self.click_coords = {
             "start_battle": (1227, 832),
             "confirm_battle": (1430, 830),
@@ -91,9 +103,64 @@ class BotEngine:
         self.stats_manager = stats_manager
         self.logger.info("StatsManager подключен к BotEngine")
 
-    def capture_screen(self):
-        """Captures the screen and returns the data."""
-        return self.adb.capture_screen()
+    def capture_screen(self) -> Optional[Frame]:
+        """
+        Captures the screen and returns it as a Frame.
+
+        The Frame is decoded once and shared by every template check, OCR call
+        and handler that looks at it. With a running frame grabber the freshest
+        buffered frame is returned instead of doing a capture round trip.
+        """
+        if self.frame_grabber and self.frame_grabber.is_running():
+            from config import config
+            max_age = config.get("capture", "max_frame_age", 1.0)
+            frame = Frame.from_screen(self.frame_grabber.get_frame(max_age=max_age))
+        else:
+            frame = Frame.from_screen(self.adb.capture_screen())
+
+        if frame is not None and frame.is_valid():
+            self.adb.frame_captured(frame.shape[1], frame.shape[0])
+            if self.screen_size is None:
+                self._set_screen_size(frame.shape[1], frame.shape[0])
+                self.logger.info(f"Разрешение экрана по первому кадру: {self.screen_size[0]}x{self.screen_size[1]}")
+        return frame
+
+    def _set_screen_size(self, width: int, height: int):
+        """Stores the device screen size and lets the matcher prepare templates for it."""
+        self.screen_size = (width, height)
+        self.image_matcher.set_screen_size(width, height)
+
+    def _detect_screen_size(self):
+        """
+        Detects the device screen size once via `wm size`.
+
+        The size is turned to the orientation of the reference resolution,
+        since `wm size` reports the natural (often portrait) orientation. If
+        detection fails, the size of the first captured frame is used.
+        """
+        if self.screen_size is not None:
+            return
+        size = self.adb.screen_size()
+        if size:
+            width, height = size
+            reference_w, reference_h = self.reference_resolution
+            if (width > height) != (reference_w > reference_h):
+                width, height = height, width
+            self._set_screen_size(width, height)
+
+    def _screen_point(self, x: int, y: int) -> Tuple[int, int]:
+        """Maps a point from the reference resolution to the device screen (same mapping as templates)."""
+        if self.screen_size is None or self.screen_size == self.reference_resolution:
+            return x, y
+        return self.image_matcher.to_screen(x, y, (self.screen_size[1], self.screen_size[0]))
+
+    def _tap(self, x: int, y: int) -> bool:
+        """Taps a point given at the reference resolution."""
+        return self.adb.tap(*self._screen_point(x, y))
+
+    def _tap_sequence(self, steps: List[Tuple[int, int, int]]) -> List[bool]:
+        """Runs AdbController.tap_sequence with points given at the reference resolution."""
+        return self.adb.tap_sequence([(*self._screen_point(x, y), delay) for x, y, delay in steps])
 
     def start(self):
         """Starts the bot in a separate thread."""
@@ -104,6 +171,9 @@ class BotEngine:
                     self.signals.error.emit("ADB не подключен. Проверьте настройки эмулятора!")
                 return False
 
+            # Разрешение экрана определяется один раз для устройства
+            self._detect_screen_size()
+
             # Сбрасываем статистику текущей сессии
             self.reset_session_stats()
 
@@ -116,6 +186,8 @@ class BotEngine:
             # Запускаем бота
             self.running.set()
             self.state = BotState.STARTING
+            if self.frame_grabber:
+                self.frame_grabber.start()
             threading.Thread(target=self._bot_loop, daemon=True).start()
             self.logger.info("▶ Бот запущен")
             return True
@@ -201,6 +273,13 @@ class BotEngine:
             # Clean up when the bot stops
             self.running.clear()
             self.state = BotState.IDLE
+            if self.frame_grabber:
+                self.frame_grabber.stop()
+            self.image_matcher.save_state()
+            counters = self.image_matcher.match_counters
+            self.logger.info(f"Сопоставлений шаблонов: выполнено {counters['performed']}, "
+                             f"пропущено без изменений кадра {counters['skipped']}, "
+                             f"из кеша {counters['cache_hits']} (промахов кеша {counters['cache_misses']})")
             if self.signals:
                 self.signals.state_changed.emit(self.state.name)
 
@@ -217,37 +296,41 @@ class BotEngine:
         # Look for the battle screen
         self.logger.info("Делаем скриншот экрана...")
         screen_data = self.capture_screen()
-        if screen_data:
+        if screen_data is not None:
             self.logger.info("Скриншот получен, анализируем...")
 
-            # Check for connection issues first
+            # Check for connection issues first - they win over any other screen
             if self._check_connection_issues(screen_data):
                 self.logger.info("Обнаружены проблемы с соединением")
                 return BotState.CONNECTION_LOST
 
+            # Other known screens are tried in order of likelihood until the first hit
+            results = self.image_matcher.match_many(
+                screen_data,
+                ["cheak.png", "confirm_battle.png", "auto_battle.png", "victory.png", "defeat.png"],
+                early_exit=True
+            )
+
             # Check if we're already on the battle screen
-            if self.image_matcher.find_in_screen(screen_data, "cheak.png"):
+            if results["cheak.png"].found:
                 self.logger.info("Найден экран выбора боя (cheak.png)")
                 return BotState.SELECTING_BATTLE
 
             # Check if we're at the battle confirmation screen
-            if self.image_matcher.find_in_screen(screen_data, "confirm_battle.png"):
+            if results["confirm_battle.png"].found:
                 self.logger.info("Найден экран подтверждения боя (confirm_battle.png)")
                 return BotState.CONFIRMING_BATTLE
 
             # Check if we're already in a battle
-            if self.image_matcher.find_in_screen(screen_data, "auto_battle.png"):
+            if results["auto_battle.png"].found:
                 self.logger.info("Найден экран боя (auto_battle.png)")
                 return BotState.IN_BATTLE
 
             # Check if a battle just ended
-            victory_found = self.image_matcher.find_in_screen(screen_data, "victory.png")
-            defeat_found = self.image_matcher.find_in_screen(screen_data, "defeat.png")
-
-            if victory_found:
+            if results["victory.png"].found:
                 self.logger.info("Найден экран победы (victory.png)")
                 return BotState.BATTLE_ENDED
-            elif defeat_found:
+            elif results["defeat.png"].found:
                 self.logger.info("Найден экран поражения (defeat.png)")
                 return BotState.BATTLE_ENDED
 
@@ -263,14 +346,14 @@ class BotEngine:
     def _handle_selecting_battle(self):
         """Handler for SELECTING_BATTLE state."""
         self.logger.info("Выбор боя...")
-        self.adb.tap(*self.click_coords["start_battle"])
+        self._tap(*self.click_coords["start_battle"])
         time.sleep(2)
         return BotState.CONFIRMING_BATTLE
 
     def _handle_confirming_battle(self):
         """Handler for CONFIRMING_BATTLE state."""
         self.logger.info("Подтверждение боя...")
-        self.adb.tap(*self.click_coords["confirm_battle"])
+        self._tap(*self.click_coords["confirm_battle"])
         self.stats["battles_started"] += 1
 
         # Оповещаем об изменении статистики
@@ -289,7 +372,7 @@ class BotEngine:
 
             # Check for connection issues
             screen_data = self.capture_screen()
-            if screen_data and self._check_connection_issues(screen_data):
+            if screen_data is not None and self._check_connection_issues(screen_data):
                 return BotState.CONNECTION_LOST
 
             return BotState.ERROR
@@ -318,7 +401,7 @@ class BotEngine:
         from config import config
 
         self.logger.info("В бою, включаем автобой...")
-        self.adb.tap(*self.click_coords["auto_battle"])
+        self._tap(*self.click_coords["auto_battle"])
 
         # Получаем значения из конфигурации
         battle_timeout = config.get("bot", "battle_timeout", 120)
@@ -338,7 +421,7 @@ class BotEngine:
         else:
             # Check for connection issues
             screen_data = self.capture_screen()
-            if screen_data and self._check_connection_issues(screen_data):
+            if screen_data is not None and self._check_connection_issues(screen_data):
                 return BotState.CONNECTION_LOST
 
             # Battle seems to be stuck, try emergency clicks
@@ -352,7 +435,7 @@ class BotEngine:
 
         # Check which result screen we're on
         screen_data = self.capture_screen()
-        if not screen_data:
+        if screen_data is None:
             return BotState.ERROR
 
         if self.image_matcher.find_in_screen(screen_data, "victory.png"):
@@ -377,7 +460,7 @@ class BotEngine:
                 self.signals.stats_updated.emit(self.stats)
 
             # Continue with normal flow - exit after win
-            self.adb.tap(*self.click_coords["exit_after_win"])
+            self._tap(*self.click_coords["exit_after_win"])
             time.sleep(5)
 
             return BotState.STARTING
@@ -390,15 +473,15 @@ class BotEngine:
             if self.signals:
                 self.signals.stats_updated.emit(self.stats)
 
-            self.adb.tap(*self.click_coords["exit_after_win"])
-            time.sleep(10)
-
             # Проверяем, не превышено ли максимальное количество попыток обновления
             max_refresh = config.get("bot", "max_refresh_attempts", 3)
-            self.logger.info(f"Обновление списка соперников (макс. попыток: {max_refresh})...")
+            self.logger.info(f"Выход и обновление списка соперников (макс. попыток: {max_refresh})...")
 
-            self.adb.tap(*self.click_coords["refresh_opponents"])
-            time.sleep(2)
+            # Выход и обновление соперников одной серией нажатий
+            self._tap_sequence([
+                (*self.click_coords["exit_after_win"], 10000),
+                (*self.click_coords["refresh_opponents"], 2000),
+            ])
 
             return BotState.STARTING
 
@@ -415,13 +498,13 @@ class BotEngine:
 
         # Wait for the "Связаться с нами" button to appear
         screen_data = self.capture_screen()
-        if not screen_data:
+        if screen_data is None:
             return BotState.ERROR
 
         # Check if we already see the contact us button
         if self.image_matcher.find_in_screen(screen_data, "contact_us.png"):
             # Click on the "Связаться с нами" button at coordinates 803, 821
-            self.adb.tap(*self.click_coords["reconnect_button"])
+            self._tap(*self.click_coords["reconnect_button"])
             time.sleep(7)
             return BotState.RECONNECTING
 
@@ -431,7 +514,7 @@ class BotEngine:
         )
 
         if result:
-            self.adb.tap(*self.click_coords["reconnect_button"])
+            self._tap(*self.click_coords["reconnect_button"])
             time.sleep(7)
             return BotState.RECONNECTING
         else:
@@ -442,11 +525,11 @@ class BotEngine:
         """Handler for RECONNECTING state - implements the recovery algorithm."""
         self.logger.info("Переподключение к игре...")
 
-        # Try to find cheak.png or confirm_battle.png first (5 seconds)
+        # Look for all known screens at once; list order sets the priority
         result, _ = self.image_matcher.wait_for_images(
             self.capture_screen,
-            ["cheak.png", "confirm_battle.png"],
-            timeout=5,
+            ["cheak.png", "confirm_battle.png", "victory.png", "defeat.png", "auto_battle.png"],
+            timeout=15,
             check_interval=1
         )
 
@@ -454,27 +537,9 @@ class BotEngine:
             return BotState.SELECTING_BATTLE
         elif result == "confirm_battle.png":
             return BotState.CONFIRMING_BATTLE
-
-        # If not found, try to find victory.png or defeat.png (another 5 seconds)
-        result, _ = self.image_matcher.wait_for_images(
-            self.capture_screen,
-            ["victory.png", "defeat.png"],
-            timeout=5,
-            check_interval=1
-        )
-
-        if result in ["victory.png", "defeat.png"]:
+        elif result in ["victory.png", "defeat.png"]:
             return BotState.BATTLE_ENDED
-
-        # If still not found, look for auto_battle.png
-        result, _ = self.image_matcher.wait_for_images(
-            self.capture_screen,
-            ["auto_battle.png"],
-            timeout=5,
-            check_interval=1
-        )
-
-        if result == "auto_battle.png":
+        elif result == "auto_battle.png":
             return BotState.IN_BATTLE
 
         # If we still can't find any known screens, return to starting state
@@ -487,20 +552,33 @@ class BotEngine:
         time.sleep(5)
         return BotState.STARTING
 
-    def _check_connection_issues(self, screen_data: bytes) -> bool:
+    def _check_connection_issues(self, screen_data: Frame) -> bool:
         """
         Checks if there are connection issues on the current screen.
 
+        Returns:
+            True if connection issues detected, False otherwise
+        """
+        results = self.image_matcher.match_many(screen_data, self.CONNECTION_TEMPLATES, parallel=True)
+        return self._connection_issue_in(results)
+
+    def _connection_issue_in(self, results) -> bool:
+        """
+        Checks match results for connection problem screens.
+
+        Args:
+            results: Mapping of template name to MatchResult from ImageMatcher.match_many
+
         Returns:
             True if connection issues detected, False otherwise
         """
         # Check for "Ожидание ответа от сервера" message
-        if self.image_matcher.find_in_screen(screen_data, "waiting_for_server.png"):
+        if results["waiting_for_server.png"].found:
             self.logger.warning("⚠ Обнаружено сообщение 'Ожидание ответа от сервера'")
             return True
 
         # Check for "Связаться с нами" button
-        if self.image_matcher.find_in_screen(screen_data, "contact_us.png"):
+        if results["contact_us.png"].found:
             self.logger.warning("⚠ Обнаружена кнопка 'Связаться с нами'")
             return True
 
@@ -510,18 +588,11 @@ class BotEngine:
         """Performs emergency clicks to try to recover from a stuck state."""
         self.logger.warning("⚠ Выполнение экстренных нажатий...")
 
-        # Click back button
-        self.adb.tap(49, 50)
-        time.sleep(2)
-
-        # Click center of screen
-        self.adb.tap(588, 825)
-        time.sleep(2)
-
-        # Click exit button position
-        self.adb.tap(743, 819)
-        time.sleep(10)
-
-        # Click refresh button position
-        self.adb.tap(215, 826)
-        time.sleep(2)
\ No newline at end of file
+        # Back button, center of screen, exit button, refresh button - one ADB round trip
+        # (coordinates at the reference resolution)
+        self._tap_sequence([
+            (49, 50, 2000),
+            (588, 825, 2000),
+            (743, 819, 10000),
+            (215, 826, 2000),
+        ])
\ No newline at end of file
@@ -0,0 +1,81 @@
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from core.adb_controller import AdbController
+
+
+class DeviceRegistry:
+    """
+    Keeps one serial-bound AdbController per attached device.
+
+    Lets several BotEngine instances run side by side on one host, each bound
+    to its own emulator.
+    """
+
+    def __init__(self, adb_path: str, **controller_options):
+        """
+        Args:
+            adb_path: Path to the adb executable
+            **controller_options: Keyword arguments passed to every AdbController
+        """
+        self.adb_path = adb_path
+        self.controller_options = controller_options
+        self.logger = logging.getLogger("BotLogger")
+
+        self._lock = threading.Lock()
+        self._controllers: Dict[Optional[str], AdbController] = {}
+        self._devices: List[Dict[str, str]] = []
+
+    def refresh(self) -> List[Dict[str, str]]:
+        """
+        Re-enumerates attached devices.
+
+        Returns:
+            Parsed `adb devices -l` entries
+        """
+        devices = AdbController(self.adb_path).list_devices()
+        with self._lock:
+            self._devices = devices
+        self.logger.info(f"Найдено устройств adb: {len(devices)}")
+        return devices
+
+    def devices(self) -> List[Dict[str, str]]:
+        """Returns the device list from the last refresh."""
+        with self._lock:
+            return list(self._devices)
+
+    def online_serials(self) -> List[str]:
+        """Returns serials of devices in the "device" state from the last refresh."""
+        return [d["serial"] for d in self.devices() if d["state"] == "device"]
+
+    def get_controller(self, serial: Optional[str] = None) -> AdbController:
+        """
+        Returns the controller bound to a device, creating it on first use.
+
+        Args:
+            serial: Device serial; None targets the only connected device
+
+        Returns:
+            AdbController instance shared by all callers asking for this serial
+        """
+        serial = serial or None
+        with self._lock:
+            controller = self._controllers.get(serial)
+            if controller is None:
+                controller = AdbController(self.adb_path, serial=serial, **self.controller_options)
+                self._controllers[serial] = controller
+            return controller
+
+    def controllers(self) -> Dict[Optional[str], AdbController]:
+        """Returns all controllers created so far, keyed by serial."""
+        with self._lock:
+            return dict(self._controllers)
+
+    def close(self):
+        """Closes persistent channels of all controllers."""
+        with self._lock:
+            controllers = list(self._controllers.values())
+            self._controllers.clear()
+        for controller in controllers:
+            controller.close()
@@ -0,0 +1,143 @@
+import time
+import zlib
+import threading
+import cv2
+import numpy as np
+from typing import Dict, Optional, Tuple, Union
+
+# Single-channel matching spaces: name -> BGR channel index
+CHANNELS = {"blue": 0, "green": 1, "red": 2}
+MATCH_SPACES = ("color", "gray", *CHANNELS)
+
+
+def to_space(bgr: np.ndarray, space: str) -> np.ndarray:
+    """
+    Converts a BGR image into a matching space.
+
+    Args:
+        bgr: BGR image
+        space: "color", "gray" or a single channel ("blue", "green", "red")
+
+    Returns:
+        Converted image (the input itself for "color")
+    """
+    if space == "color":
+        return bgr
+    if space == "gray":
+        return cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    if space in CHANNELS:
+        return cv2.extractChannel(bgr, CHANNELS[space])
+    raise ValueError(f"Неизвестное пространство сопоставления: {space}")
+
+
+class Frame:
+    """
+    One captured screen, decoded once and shared by every check of a tick.
+
+    Accepts encoded (PNG) bytes or an already decoded BGR image. The BGR image
+    and derived variants (gray, downscaled) are computed lazily on first access
+    and cached on the frame.
+    """
+
+    def __init__(self, data: Union[bytes, bytearray, memoryview, np.ndarray]):
+        """
+        Args:
+            data: PNG bytes from `screencap -p` or a BGR image from raw capture
+        """
+        self.data = data
+        self.captured_at = time.time()
+
+        self._bgr: Optional[np.ndarray] = data if isinstance(data, np.ndarray) else None
+        self._decoded = self._bgr is not None
+        self._variants: Dict[Tuple[str, float], np.ndarray] = {}
+        self._fingerprint: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_screen(cls, screen_data) -> Optional["Frame"]:
+        """
+        Wraps screen data into a Frame, passing Frames and None through unchanged.
+
+        Args:
+            screen_data: Frame, PNG bytes, BGR image or None
+
+        Returns:
+            Frame instance or None
+        """
+        if screen_data is None or isinstance(screen_data, Frame):
+            return screen_data
+        return cls(screen_data)
+
+    @property
+    def bgr(self) -> Optional[np.ndarray]:
+        """Decoded BGR image, or None if the data could not be decoded."""
+        if not self._decoded:
+            with self._lock:
+                if not self._decoded:
+                    screen_array = np.frombuffer(self.data, dtype=np.uint8)
+                    self._bgr = cv2.imdecode(screen_array, cv2.IMREAD_COLOR)
+                    self._decoded = True
+        return self._bgr
+
+    @property
+    def gray(self) -> Optional[np.ndarray]:
+        """Grayscale version of the frame."""
+        return self.variant("gray")
+
+    @property
+    def shape(self) -> Optional[Tuple[int, ...]]:
+        """Shape of the BGR image, or None if decoding failed."""
+        bgr = self.bgr
+        return bgr.shape if bgr is not None else None
+
+    @property
+    def fingerprint(self) -> Optional[int]:
+        """
+        Content fingerprint: CRC32 of the whole decoded image plus its shape.
+        Equal frames (even separate captures) share it; every pixel counts, so
+        a one-pixel-wide change (thin text, a line) gives a new fingerprint.
+        """
+        if self._fingerprint is None:
+            bgr = self.bgr
+            if bgr is None:
+                return None
+            self._fingerprint = zlib.crc32(np.ascontiguousarray(bgr), zlib.crc32(repr(bgr.shape).encode()))
+        return self._fingerprint
+
+    def is_valid(self) -> bool:
+        """Returns True if the frame decodes to an image."""
+        return self.bgr is not None
+
+    def downscaled(self, scale: float) -> Optional[np.ndarray]:
+        """BGR image resized by `scale` (e.g. 0.5)."""
+        return self.variant("color", scale)
+
+    def variant(self, space: str = "color", scale: float = 1.0) -> Optional[np.ndarray]:
+        """
+        Returns a cached variant of the frame.
+
+        Args:
+            space: "color" for BGR, "gray" for grayscale or a single channel
+                ("blue", "green", "red")
+            scale: Resize factor relative to the captured resolution
+
+        Returns:
+            Image variant or None if the frame could not be decoded
+        """
+        bgr = self.bgr
+        if bgr is None:
+            return None
+        if space == "color" and scale == 1.0:
+            return bgr
+
+        key = (space, scale)
+        image = self._variants.get(key)
+        if image is None:
+            if scale != 1.0:
+                base = self.variant(space)
+                image = cv2.resize(base, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            else:
+                image = to_space(bgr, space)
+            with self._lock:
+                image = self._variants.setdefault(key, image)
+        return image
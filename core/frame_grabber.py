@@ -0,0 +1,139 @@
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Optional, Tuple
+
+
+class FrameGrabber:
+    """
+    Background screen capture thread for one device.
+
+    Keeps a small ring buffer of timestamped frames so state handlers can take
+    the freshest frame without waiting for a capture round trip. Capture rate is
+    capped by `max_fps`, and the thread pauses when nobody has asked for a frame
+    for `idle_timeout` seconds.
+    """
+
+    def __init__(self,
+                 capture_func: Callable[[], Optional[Any]],
+                 max_fps: float = 5,
+                 buffer_size: int = 3,
+                 idle_timeout: float = 5):
+        """
+        Args:
+            capture_func: Function that captures one frame (e.g. AdbController.capture_screen)
+            max_fps: Maximum number of captures per second
+            buffer_size: Number of most recent frames kept in the ring buffer
+            idle_timeout: Seconds without consumers after which capturing pauses
+        """
+        self.capture_func = capture_func
+        self.min_interval = 1.0 / max_fps if max_fps > 0 else 0
+        self.idle_timeout = idle_timeout
+        self.logger = logging.getLogger("BotLogger")
+
+        # Ring buffer of (timestamp, frame); timestamp is taken before the capture starts
+        self.frames: Deque[Tuple[float, Any]] = deque(maxlen=max(1, buffer_size))
+
+        self._cond = threading.Condition()
+        self._running = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_request = 0.0
+
+    def is_running(self) -> bool:
+        """Returns True if the capture thread is active."""
+        return self._running.is_set()
+
+    def start(self):
+        """Starts the capture thread."""
+        if self._running.is_set():
+            return
+        with self._cond:
+            self.frames.clear()
+            self._last_request = time.time()
+        self._running.set()
+        self._thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self._thread.start()
+        self.logger.debug("Фоновый захват кадров запущен")
+
+    def stop(self):
+        """Stops the capture thread and drops buffered frames."""
+        if not self._running.is_set():
+            return
+        self._running.clear()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=10)
+        self._thread = None
+        with self._cond:
+            self.frames.clear()
+        self.logger.debug("Фоновый захват кадров остановлен")
+
+    def latest(self) -> Optional[Tuple[float, Any]]:
+        """Returns the newest (timestamp, frame) pair without waiting, or None."""
+        with self._cond:
+            return self.frames[-1] if self.frames else None
+
+    def get_frame(self, max_age: float = 1.0, timeout: float = 10) -> Optional[Any]:
+        """
+        Returns the freshest frame that is not older than `max_age`.
+
+        Waits for the capture thread only when the buffered frame is too old,
+        e.g. right after capturing was paused for lack of consumers.
+
+        Args:
+            max_age: Maximum age of the returned frame in seconds
+            timeout: Maximum wait time for a fresh frame in seconds
+
+        Returns:
+            Frame or None if no fresh frame arrived in time
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            self._last_request = time.time()
+            self._cond.notify_all()
+
+            while self._running.is_set():
+                if self.frames and time.time() - self.frames[-1][0] <= max_age:
+                    return self.frames[-1][1]
+
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+        self.logger.warning("⚠ Не удалось получить свежий кадр от фонового захвата")
+        return None
+
+    def _capture_loop(self):
+        """Captures frames until stopped, respecting max FPS and consumer demand."""
+        while self._running.is_set():
+            # Backpressure: if nobody asked for frames recently, sleep until someone does
+            with self._cond:
+                while (self._running.is_set() and
+                       time.time() - self._last_request > self.idle_timeout):
+                    self._cond.wait()
+            if not self._running.is_set():
+                break
+
+            started = time.time()
+            try:
+                frame = self.capture_func()
+            except Exception as e:
+                self.logger.error(f"🚨 Ошибка фонового захвата кадра: {e}")
+                frame = None
+
+            if frame is not None:
+                with self._cond:
+                    self.frames.append((started, frame))
+                    self._cond.notify_all()
+
+            # Ограничение частоты захвата
+            delay = self.min_interval - (time.time() - started)
+            if frame is None:
+                delay = max(delay, 1.0)
+            if delay > 0:
+                # stop() прерывает ожидание без задержки
+                with self._cond:
+                    self._cond.wait_for(lambda: not self._running.is_set(), timeout=delay)
@@ -1,20 +1,214 @@
 import os
 import cv2
+import json
 import numpy as np
 import logging
+import threading
 import time
-from typing import Tuple, Optional, List, Dict, Union, Callable
+from concurrent.futures import Executor, ThreadPoolExecutor
+from collections import OrderedDict, defaultdict
+from typing import Tuple, Optional, List, Dict, Union, Callable, NamedTuple
+
+from core.frame import Frame, MATCH_SPACES, to_space
+from core.template_bank import TemplateBank
+from core.screen_classifier import ScreenClassifier
+
+# Screen data accepted by the matcher: a shared Frame, PNG bytes or a BGR image
+ScreenData = Union[Frame, bytes, np.ndarray]
+
+# Search region in screen pixels: (x, y, width, height)
+Region = Tuple[int, int, int, int]
+
+
+class MatchResult(NamedTuple):
+    """Outcome of matching one template against one frame."""
+    name: str
+    score: float
+    location: Optional[Tuple[int, int]]
+    found: bool
 
 
 class ImageMatcher:
     """Handles image recognition for game elements."""
 
-    def __init__(self, template_dir: str):
+    # Consecutive misses inside a search region before one full-frame search
+    ROI_MAX_MISSES = 3
+    # Growth factor of a search region after each miss
+    ROI_WIDEN_FACTOR = 1.5
+    # Padding around a found template when its search region is learned
+    ROI_MARGIN = 40
+    # Smallest template side (in pixels, after downscaling) usable for coarse matching
+    PYRAMID_MIN_TEMPLATE_SIZE = 12
+    # Number of coarse candidates verified at full resolution
+    PYRAMID_CANDIDATES = 3
+    # Scale of the gray thumbnail compared by frame-change detection
+    CHANGE_SCALE = 0.125
+    # Padding of the window around a template's last known location
+    PRIOR_PADDING = 6
+    # Pixel probes: grid cells per side, colour tolerance per channel, share
+    # of matching probes at or below which the screen is a definite miss, and
+    # probe misses in a row after which a real search is run anyway
+    PROBE_GRID = 3
+    PROBE_TOLERANCE = 24
+    PROBE_MISS_RATIO = 0.5
+    PROBE_RECHECK = 10
+    # Smallest search area (pixels) split into bands matched in parallel
+    PARALLEL_MIN_AREA = 400_000
+    # Most local maxima passed to non-maximum suppression in find_all
+    FIND_ALL_MAX_CANDIDATES = 500
+
+    # OpenCV thread count applied to the process (cv2.setNumThreads is process-wide,
+    # so only the first matcher sets it)
+    _process_cv_threads: Optional[int] = None
+    _process_cv_lock = threading.Lock()
+
+    def __init__(self, template_dir: str, regions: Optional[Dict[str, Region]] = None,
+                 roi_max_misses: Optional[int] = None, match_mode: str = "full",
+                 pyramid_scale: float = 0.5, pyramid_tolerance: float = 0.1,
+                 match_spaces: Optional[Dict[str, str]] = None, default_space: str = "color",
+                 template_bank: Optional[TemplateBank] = None,
+                 screen_classifier: Optional[ScreenClassifier] = None,
+                 transitions_file: Optional[str] = None,
+                 change_detection: bool = False, change_threshold: float = 8,
+                 priors_file: Optional[str] = None, device_id: str = "default",
+                 pixel_probes: bool = False,
+                 executor: Optional[Executor] = None, max_workers: int = 0,
+                 cv_threads: Optional[int] = None, bots_per_host: int = 1,
+                 reference_resolution: Tuple[int, int] = (1600, 900),
+                 cache_size: int = 0):
+        """
+        Args:
+            template_dir: Directory with template images
+            regions: Default search region (x, y, width, height) per template name;
+                templates without one are searched over the full frame until found
+            roi_max_misses: Misses inside a region before a full-frame search
+            match_mode: "full" for full-resolution matching or "pyramid" for
+                coarse-to-fine matching on a downscaled frame
+            pyramid_scale: Downscale factor of the coarse pass (e.g. 0.5 or 0.25)
+            pyramid_tolerance: How far below the threshold a coarse score may be
+                and still be verified at full resolution
+            match_spaces: Matching space per template name: "color", "gray" or a
+                single channel ("blue", "green", "red")
+            default_space: Matching space of templates not listed in match_spaces
+            template_bank: Preloaded templates and variants; without a bank
+                templates are loaded lazily on first use
+            screen_classifier: Perceptual-hash classifier that proposes the
+                screen before any template is matched
+            transitions_file: JSON file the learned screen transition counts
+                are loaded from and saved to
+            change_detection: If True, a template's previous result is reused
+                while its search region has not changed since that search
+            change_threshold: Largest per-pixel difference (0-255) of the
+                downsampled gray frame still treated as unchanged
+            priors_file: JSON file with the last known template locations; a
+                small window around them is checked before any other search
+            device_id: Device the priors belong to (e.g. the adb serial)
+            pixel_probes: If True, a few pixel colours sampled from the first
+                confident match decide later hits and misses without matchTemplate
+            executor: Shared executor for parallel matching (e.g. one pool for
+                all bots of a process); by default the matcher creates its own
+            max_workers: Worker threads of the matcher's own pool; 0 picks
+                min(8, this bot's share of the CPUs)
+            cv_threads: Threads OpenCV may use inside one call; None picks 1 when
+                the pool has several workers, otherwise this bot's CPU share.
+                cv2.setNumThreads is process-wide, so the first matcher of the
+                process decides and later matchers keep its setting
+            bots_per_host: Bots running on this machine; the CPU count is split
+                among them, so the defaults above never oversubscribe the host
+            reference_resolution: Screen size (width, height) the templates,
+                regions and tap points were made at; at other sizes templates are
+                rescaled once per resolution (see to_screen for the mapping)
+            cache_size: Entries of the LRU cache of results keyed by frame
+                fingerprint; 0 disables the cache
+        """
         self.template_dir = template_dir
         self.logger = logging.getLogger("BotLogger")
+        self.reference_resolution = tuple(reference_resolution)
+        # Template scale of the device screen, set by set_screen_size; the template
+        # bank prepares variants at this scale
+        self.expected_scale = 1.0
+
+        self.match_mode = match_mode
+        self.pyramid_scale = pyramid_scale
+        self.pyramid_tolerance = pyramid_tolerance
+
+        # Пространство сопоставления для каждого шаблона
+        self.match_spaces: Dict[str, str] = dict(match_spaces or {})
+        self.default_space = default_space
+        for name, space in [*self.match_spaces.items(), ("по умолчанию", default_space)]:
+            if space not in MATCH_SPACES:
+                raise ValueError(f"Неизвестное пространство сопоставления для {name}: {space}")
+
+        # Adaptive search regions: template -> {"base", "current", "misses"}
+        self.regions: Dict[str, Region] = {name: tuple(region) for name, region in (regions or {}).items()}
+        self.roi_max_misses = roi_max_misses or self.ROI_MAX_MISSES
+        self._roi_state: Dict[str, Dict] = {}
 
         # Cache for loaded templates
         self.templates: Dict[str, np.ndarray] = {}
+        # Template variants in their matching space: (name, space, scale) -> image
+        self.template_variants: Dict[Tuple[str, str, float], np.ndarray] = {}
+        self.template_bank = template_bank
+        self.screen_classifier = screen_classifier
+
+        # Learned screen transitions: previous screen -> {next screen: count}
+        self.transitions_file = transitions_file
+        self.transitions: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.last_screen: Optional[str] = None
+        if transitions_file:
+            self.load_transitions()
+
+        # Frame-change detection: template -> last search (thumbnail, region, threshold, result)
+        self.change_detection = change_detection
+        self.change_threshold = change_threshold
+        self._last_searches: Dict[str, Dict] = {}
+        self.match_counters = {"performed": 0, "skipped": 0, "prior_hits": 0, "probe_hits": 0, "probe_misses": 0,
+                               "cache_hits": 0, "cache_misses": 0}
+        self._counters_lock = threading.Lock()
+
+        # Last known locations: "device|WxH" -> {template: (x, y)}
+        self.priors_file = priors_file
+        self.device_id = device_id
+        self.priors: Dict[str, Dict[str, Tuple[int, int]]] = defaultdict(dict)
+        if priors_file:
+            self.load_priors()
+
+        # Pixel probe signatures: ("device|WxH", template) -> {"xs", "ys", "colors", "misses"}
+        self.pixel_probes = pixel_probes
+        self.probes: Dict[Tuple[str, str], Dict] = {}
+
+        # LRU cache of results: (method, frame fingerprint, template, region, ...) -> result
+        # (match results are stored with the region their search covered)
+        self.cache_size = cache_size
+        self._result_cache: "OrderedDict[Tuple, object]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        # Worker pool for parallel multi-template and multi-band matching
+        # (own pool is created on first use)
+        self._executor: Optional[Executor] = executor
+        # Доля ядер этого бота: несколько ботов на одной машине делят процессор
+        cpu_budget = max(1, (os.cpu_count() or 1) // max(1, bots_per_host))
+        self.max_workers = max_workers or min(8, cpu_budget)
+        self._worker_state = threading.local()
+
+        # Потоки пула уже занимают ядра - внутри одного вызова OpenCV работает в один поток
+        if cv_threads is None:
+            cv_threads = 1 if self.max_workers > 1 else cpu_budget
+        self._apply_cv_threads(cv_threads)
+
+    def _apply_cv_threads(self, cv_threads: int):
+        """Sets OpenCV's thread count once per process; later matchers keep it."""
+        with ImageMatcher._process_cv_lock:
+            current = ImageMatcher._process_cv_threads
+            if current is None:
+                cv2.setNumThreads(cv_threads)
+                ImageMatcher._process_cv_threads = cv_threads
+                current = cv_threads
+        if current != cv_threads:
+            self.logger.warning(
+                f"⚠ Потоки OpenCV уже заданы для процесса ({current}), запрошенное значение {cv_threads} "
+                f"не применено")
+        self.logger.debug(f"Потоков сопоставления: {self.max_workers}, потоков OpenCV: {current}")
 
     def load_template(self, template_name: str) -> Optional[np.ndarray]:
         """
@@ -30,6 +224,12 @@ class ImageMatcher:
             self.logger.debug(f"Использую кешированный шаблон: {template_name}")
             return self.templates[template_name]
 
+        if self.template_bank is not None:
+            template = self.template_bank.template(template_name)
+            if template is not None:
+                self.templates[template_name] = template
+            return template
+
         template_path = os.path.join(self.template_dir, template_name)
         self.logger.debug(f"Загрузка шаблона из: {template_path}")
 
@@ -46,25 +246,288 @@ class ImageMatcher:
         self.logger.debug(f"Шаблон {template_name} загружен успешно, размер: {template.shape}")
         return template
 
+    @staticmethod
+    def decode_screen(screen_data: ScreenData) -> Optional[np.ndarray]:
+        """
+        Converts screen data into a BGR image.
+
+        Args:
+            screen_data: Frame, encoded (PNG) screen bytes or an already decoded BGR image
+
+        Returns:
+            BGR image as NumPy array or None if decoding failed
+        """
+        frame = Frame.from_screen(screen_data)
+        return frame.bgr if frame is not None else None
+
     def find_in_screen(self,
-                   screen_data: bytes,
+                   screen_data: ScreenData,
                    template_name: str,
                    threshold: float = 0.8) -> Optional[Tuple[int, int]]:
         """
         Searches for a template in the screen data.
 
         Args:
-            screen_data: Raw screen capture data
+            screen_data: Frame or raw screen capture data (PNG bytes or BGR image)
             template_name: Name of the template to find
             threshold: Matching threshold (0-1)
 
         Returns:
             (x, y) coordinates of the top-left corner of the match or None if not found
         """
+        frame = Frame.from_screen(screen_data)
+        result = self._match_template(frame, template_name, threshold)
+        if result is None or not result.found:
+            return None
+
+        self.logger.info(
+            f"✅ Найдено изображение ({template_name}) с точностью {result.score:.2f} на координатах {result.location}")
+        return result.location
+
+    def find_all(self,
+                 screen_data: ScreenData,
+                 template_name: str,
+                 threshold: float = 0.8,
+                 max_overlap: float = 0.3,
+                 region: Optional[Region] = None) -> List[MatchResult]:
+        """
+        Finds every occurrence of a template (e.g. several reward icons).
+
+        The response map is thresholded with NumPy, reduced to local maxima,
+        and overlapping matches are removed by non-maximum suppression over a
+        precomputed overlap matrix.
+
+        Args:
+            screen_data: Frame or raw screen capture data
+            template_name: Name of the template to find
+            threshold: Matching threshold (0-1)
+            max_overlap: Largest intersection-over-union two kept matches may have
+            region: Search region (x, y, width, height), None for the full frame
+
+        Returns:
+            Matches sorted by score, best first; empty if nothing was found
+        """
+        frame = Frame.from_screen(screen_data)
+        if frame is None or not frame.is_valid():
+            self.logger.error("🚨 Не удалось декодировать изображение экрана")
+            return []
+
+        space = self.match_space(template_name)
+        screen_img = frame.variant(space)
+        template = self.template_variant(template_name, space, self.screen_scale(screen_img.shape))
+        if template is None:
+            self.logger.error(f"🚨 Не удалось загрузить шаблон: {template_name}")
+            return []
+
+        if region is not None:
+            region = self._clip_region(region, screen_img.shape, template.shape)
+        cache_key = ("find_all", frame.fingerprint, template_name, region, space, threshold, max_overlap)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return list(cached)
+
+        offset_x, offset_y, width, height = region or (0, 0, screen_img.shape[1], screen_img.shape[0])
+        response = cv2.matchTemplate(screen_img[offset_y:offset_y + height, offset_x:offset_x + width],
+                                     template, cv2.TM_CCOEFF_NORMED)
+
+        # Кандидаты - локальные максимумы выше порога
+        template_h, template_w = template.shape[:2]
+        peaks = (response >= threshold) & (response == cv2.dilate(response, np.ones((3, 3), np.uint8)))
+        ys, xs = np.nonzero(peaks)
+        if len(xs) == 0:
+            self._cache_put(cache_key, [])
+            return []
+        scores = response[ys, xs]
+        order = np.argsort(-scores, kind="stable")[:self.FIND_ALL_MAX_CANDIDATES]
+        xs, ys, scores = xs[order], ys[order], scores[order]
+
+        # Матрица пересечений всех пар кандидатов (шаблоны одного размера)
+        overlap_w = np.clip(template_w - np.abs(xs[:, None] - xs[None, :]), 0, None)
+        overlap_h = np.clip(template_h - np.abs(ys[:, None] - ys[None, :]), 0, None)
+        intersection = overlap_w * overlap_h
+        area = template_w * template_h
+        iou = intersection / (2 * area - intersection)
+
+        keep = np.ones(len(xs), dtype=bool)
+        for i in range(len(xs)):
+            if keep[i]:
+                # Более слабые кандидаты, перекрывающиеся с принятым, отбрасываются
+                keep[i + 1:] &= iou[i, i + 1:] <= max_overlap
+
+        matches = [MatchResult(template_name, float(score), (int(x) + offset_x, int(y) + offset_y), True)
+                   for x, y, score in zip(xs[keep], ys[keep], scores[keep])]
+        self.logger.debug(f"Найдено совпадений шаблона {template_name}: {len(matches)}")
+        self._cache_put(cache_key, matches)
+        return list(matches)
+
+    def match_many(self,
+                   screen_data: ScreenData,
+                   template_names: List[str],
+                   threshold: float = 0.8,
+                   parallel: bool = False,
+                   early_exit: bool = False,
+                   learned_order: bool = True) -> Dict[str, MatchResult]:
+        """
+        Scores every template against one decoded frame in a single pass.
+
+        Args:
+            screen_data: Frame or raw screen capture data
+            template_names: Templates to score
+            threshold: Matching threshold (0-1)
+            parallel: If True, templates are matched on a worker pool
+                (OpenCV releases the GIL while matching)
+            early_exit: If True, templates are tried one by one and matching
+                stops at the first hit; templates not tried are reported as not
+                found
+            learned_order: With early_exit, try the most likely successor of the
+                last seen screen first; if False, `template_names` order is the
+                priority. Callers must match templates that have to win over
+                every other screen (e.g. connection errors) separately first
+
+        With early_exit and learned_order, the template of the screen proposed
+        by the screen classifier is tried first.
+
+        Returns:
+            Mapping of template name to MatchResult; templates that could not
+            be matched get a result with score 0 and found=False
+        """
+        frame = Frame.from_screen(screen_data)
+        names = list(dict.fromkeys(template_names))
+
+        if early_exit:
+            order = names
+            if learned_order:
+                order = self._classified_first(frame, self.order_by_likelihood(names))
+            results = {name: MatchResult(name, 0.0, None, False) for name in names}
+            for name in order:
+                match = self._match_template(frame, name, threshold)
+                if match is not None:
+                    results[name] = match
+                    if match.found:
+                        self.logger.info(
+                            f"✅ Найдено изображение ({name}) с точностью {match.score:.2f} на координатах {match.location}")
+                        self.record_screen(name)
+                        break
+            return results
+
+        # is_valid() декодирует кадр до раздачи потокам, чтобы не делать это в каждом;
+        # пустой или битый кадр обрабатывается последовательно (все промахи)
+        if parallel and len(names) > 1 and frame is not None and frame.is_valid():
+            matches = self._map_parallel(lambda name: self._match_template(frame, name, threshold), names)
+        else:
+            matches = [self._match_template(frame, name, threshold) for name in names]
+
+        results = {}
+        for name, match in zip(names, matches):
+            if match is None:
+                match = MatchResult(name, 0.0, None, False)
+            elif match.found:
+                self.logger.info(
+                    f"✅ Найдено изображение ({name}) с точностью {match.score:.2f} на координатах {match.location}")
+            results[name] = match
+
+        found = [match for match in results.values() if match.found]
+        if found:
+            self.record_screen(max(found, key=lambda match: match.score).name)
+        return results
+
+    def _map_parallel(self, func: Callable, items: List) -> List:
+        """
+        Runs func over items on the worker pool.
+
+        Calls made from a pool worker run sequentially, so nested fan-out
+        (bands of one template inside a multi-template search) cannot
+        exhaust the pool and deadlock.
+        """
+        if getattr(self._worker_state, "active", False) or self.max_workers < 2:
+            return [func(item) for item in items]
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="matcher")
+
+        def run(item):
+            self._worker_state.active = True
+            try:
+                return func(item)
+            finally:
+                self._worker_state.active = False
+
+        return list(self._executor.map(run, items))
+
+    def order_by_likelihood(self, template_names: List[str]) -> List[str]:
+        """
+        Sorts templates by how often their screen followed the last seen screen.
+
+        Templates with equal counts keep their order from `template_names`.
+        """
+        if self.last_screen is None or self.last_screen not in self.transitions:
+            return list(template_names)
+        counts = self.transitions[self.last_screen]
+        return sorted(template_names, key=lambda name: -counts.get(name, 0))
+
+    def record_screen(self, template_name: str):
+        """Counts a transition from the last seen screen to this one."""
+        if self.last_screen is not None:
+            self.transitions[self.last_screen][template_name] += 1
+        self.last_screen = template_name
+
+    def load_transitions(self):
+        """Loads learned transition counts from the transitions file."""
+        if not self.transitions_file or not os.path.exists(self.transitions_file):
+            return
+        try:
+            with open(self.transitions_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for previous, counts in data.items():
+                for name, count in counts.items():
+                    self.transitions[previous][name] = int(count)
+            self.logger.debug(f"Загружены переходы между экранами: {len(data)} состояний")
+        except Exception as e:
+            self.logger.error(f"🚨 Ошибка при загрузке переходов между экранами: {e}")
+
+    def save_transitions(self):
+        """Saves learned transition counts to the transitions file."""
+        if not self.transitions_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.transitions_file)), exist_ok=True)
+            with open(self.transitions_file, "w", encoding="utf-8") as f:
+                json.dump({previous: dict(counts) for previous, counts in self.transitions.items()},
+                          f, ensure_ascii=False, indent=2)
+            self.logger.debug(f"Переходы между экранами сохранены: {self.transitions_file}")
+        except Exception as e:
+            self.logger.error(f"🚨 Ошибка при сохранении переходов между экранами: {e}")
+
+    def _classified_first(self, frame: Optional[Frame], names: List[str]) -> List[str]:
+        """
+        Moves the template of the screen proposed by the classifier to the front.
+
+        The classifier only orders candidates; the template still has to match.
+
+        Returns:
+            `names` reordered, or unchanged without a usable proposal
+        """
+        if self.screen_classifier is None or frame is None or len(names) < 2:
+            return names
+
+        proposal = self.screen_classifier.classify(frame)
+        if proposal is None or proposal[0] not in names:
+            return names
+
+        label, distance = proposal
+        self.logger.debug(f"Классификатор предложил экран {label} (расстояние {distance})")
+        return [label] + [name for name in names if name != label]
+
+    def _match_template(self, frame: Optional[Frame], template_name: str,
+                        threshold: float) -> Optional[MatchResult]:
+        """
+        Matches one template against a frame.
+
+        Returns:
+            MatchResult or None if the frame or template is unusable
+        """
         # Convert screen data to OpenCV format
         try:
-            screen_array = np.frombuffer(screen_data, dtype=np.uint8)
-            screen_img = cv2.imdecode(screen_array, cv2.IMREAD_COLOR)
+            screen_img = frame.bgr if frame is not None else None
             if screen_img is None:
                 self.logger.error("🚨 Не удалось декодировать изображение экрана")
                 return None
@@ -74,34 +537,599 @@ class ImageMatcher:
             self.logger.error(f"🚨 Ошибка при обработке данных экрана: {e}")
             return None
 
-        # Load template
-        template = self.load_template(template_name)
+        # Load template (rescaled to the screen resolution)
+        template = self.template_variant(template_name, "color", self.screen_scale(screen_img.shape))
         if template is None:
             self.logger.error(f"🚨 Не удалось загрузить шаблон: {template_name}")
             return None
 
         # Perform template matching
         try:
-            self.logger.debug(f"Поиск шаблона {template_name} с порогом {threshold}")
-            result = cv2.matchTemplate(screen_img, template, cv2.TM_CCOEFF_NORMED)
-            _, max_val, _, max_loc = cv2.minMaxLoc(result)
+            region = self._search_region(template_name, screen_img.shape, template.shape)
 
-            self.logger.debug(f"Результат поиска шаблона {template_name}: max_val={max_val:.2f}, max_loc={max_loc}")
+            # Тот же вопрос о том же кадре и той же области - ответ из кеша. Адаптивная
+            # область обновляется так же, как после настоящего поиска, иначе промах
+            # в узкой области повторялся бы бесконечно
+            cache_key = ("match", frame.fingerprint, template_name, region,
+                         self.match_mode, self.match_space(template_name), threshold)
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                result, searched = cached
+                self._update_region(template_name, result.found, result.location, searched,
+                                    screen_img.shape, template.shape)
+                return result
 
-            if max_val >= threshold:
-                self.logger.info(
-                    f"✅ Найдено изображение ({template_name}) с точностью {max_val:.2f} на координатах {max_loc}")
-                return max_loc
+            previous = self._unchanged_search(frame, template_name, region, threshold)
+            if previous is not None:
+                # Область не изменилась с прошлого поиска - результат тот же
+                max_val, max_loc = previous
+                self._count("skipped")
             else:
+                max_val, max_loc, region = self._locate(frame, template_name, template.shape, region, threshold)
+                self._remember_search(frame, template_name, region, threshold, (max_val, max_loc))
+            self.logger.debug(f"Результат поиска шаблона {template_name}: max_val={max_val:.2f}, max_loc={max_loc}")
+
+            if max_val < threshold:
                 self.logger.debug(
                     f"❌ Шаблон {template_name} не найден (max_val={max_val:.2f} < threshold={threshold:.2f})")
-                return None
+            result = MatchResult(template_name, float(max_val), max_loc, max_val >= threshold)
+            self._cache_put(cache_key, (result, region))
+            return result
         except Exception as e:
             self.logger.error(f"🚨 Ошибка при сопоставлении шаблона: {e}")
             return None
 
+    def _locate(self, frame: Frame, template_name: str, template_shape: Tuple[int, ...],
+                region: Optional[Region], threshold: float) -> Tuple[float, Tuple[int, int], Optional[Region]]:
+        """
+        Runs the search stages for one template: pixel probes, the window at the
+        last known location, then the adaptive region or the full frame.
+
+        Returns:
+            (score, location, region the result covers)
+        """
+        probed = self._check_probes(frame, template_name)
+        if probed is not None:
+            found, max_val, max_loc = probed
+            self._count("probe_hits" if found else "probe_misses")
+            if found:
+                # Оценка проб - не корреляция: согласие всех проб - попадание при любом пороге
+                max_val = max(threshold, max_val)
+                self._update_region(template_name, True, max_loc, None, frame.shape, template_shape)
+            else:
+                max_val = min(max_val, threshold * 0.5)
+            return max_val, max_loc, region
+
+        prior = self._search_prior(frame, template_name, template_shape, threshold)
+        if prior is not None:
+            region, (max_val, max_loc) = prior
+            self._count("prior_hits")
+        else:
+            self.logger.debug(
+                f"Поиск шаблона {template_name} с порогом {threshold} в области {region or 'весь кадр'}")
+            max_val, max_loc = self._search(frame, template_name, region, threshold)
+
+        if max_val >= threshold:
+            self._remember_location(template_name, frame.shape, max_loc)
+            self._derive_probes(frame, template_name, max_loc)
+        self._update_region(template_name, max_val >= threshold, max_loc, region, frame.shape, template_shape)
+        self._count("performed")
+        return max_val, max_loc, region
+
+    def _derive_probes(self, frame: Frame, template_name: str, location: Tuple[int, int]):
+        """
+        Builds a pixel probe signature from a confident match.
+
+        One probe is taken per grid cell of the template, at its flattest pixel
+        (so a one-pixel shift does not change the colour), and kept only if the
+        frame shows the same colour there. Signatures whose probes are all of
+        nearly the same colour are not used, as they cannot tell screens apart.
+        """
+        if not self.pixel_probes:
+            return
+        key = (self._prior_key(frame.shape), template_name)
+        if key in self.probes:
+            return
+
+        template = self.template_variant(template_name, "color", self.screen_scale(frame.shape))
+        template_h, template_w = template.shape[:2]
+        gray = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY).astype(np.float32)
+        local_var = np.full_like(gray, np.inf)
+        # Края шаблона не используем: там чаще всего фон
+        local_var[2:-2, 2:-2] = (cv2.blur(gray * gray, (3, 3)) - cv2.blur(gray, (3, 3)) ** 2)[2:-2, 2:-2]
+
+        xs, ys = [], []
+        grid = self.PROBE_GRID
+        for row in range(grid):
+            for col in range(grid):
+                y0, y1 = row * template_h // grid, (row + 1) * template_h // grid
+                x0, x1 = col * template_w // grid, (col + 1) * template_w // grid
+                cell = local_var[y0:y1, x0:x1]
+                if cell.size == 0 or not np.isfinite(cell.min()):
+                    continue
+                cy, cx = np.unravel_index(np.argmin(cell), cell.shape)
+                xs.append(x0 + cx)
+                ys.append(y0 + cy)
+        if not xs:
+            return
+
+        xs, ys = np.array(xs), np.array(ys)
+        colors = template[ys, xs].astype(np.int16)
+        screen_xs, screen_ys = xs + location[0], ys + location[1]
+        on_screen = frame.bgr[screen_ys, screen_xs].astype(np.int16)
+        keep = np.abs(on_screen - colors).max(axis=1) <= self.PROBE_TOLERANCE
+        colors = colors[keep]
+        if len(colors) < 4 or int((colors.max(axis=0) - colors.min(axis=0)).max()) < 2 * self.PROBE_TOLERANCE:
+            self.logger.debug(f"Для шаблона {template_name} не удалось подобрать различимые пиксели-пробы")
+            return
+
+        self.probes[key] = {
+            "xs": screen_xs[keep],
+            "ys": screen_ys[keep],
+            "colors": colors,
+            "location": (int(location[0]), int(location[1])),
+            "misses": 0,
+        }
+        self.logger.debug(f"Пиксели-пробы для шаблона {template_name}: {len(colors)} точек")
+
+    def _check_probes(self, frame: Frame, template_name: str) -> Optional[Tuple[bool, float, Tuple[int, int]]]:
+        """
+        Checks the pixel probes of a template with one vectorized gather.
+
+        Returns:
+            (hit, score, location) when all probes agree (hit) or most disagree
+            (miss); None when there is no signature or the probes are ambiguous.
+            The score is the probe agreement, not a correlation value, so the
+            caller decides by the hit flag rather than by a threshold.
+        """
+        probes = self.probes.get((self._prior_key(frame.shape), template_name))
+        if probes is None:
+            return None
+
+        colors = frame.bgr[probes["ys"], probes["xs"]].astype(np.int16)
+        diff = np.abs(colors - probes["colors"]).max(axis=1)
+        matched = float(np.mean(diff <= self.PROBE_TOLERANCE))
+        score = min(1.0 - float(diff.mean()) / 255, matched)
+
+        if matched == 1.0:
+            probes["misses"] = 0
+            return True, score, probes["location"]
+        if matched <= self.PROBE_MISS_RATIO:
+            probes["misses"] += 1
+            # Время от времени ищем по-настоящему: кнопка могла сместиться
+            if probes["misses"] < self.PROBE_RECHECK:
+                return False, score, probes["location"]
+            probes["misses"] = 0
+        return None
+
+    def _prior_key(self, screen_shape: Tuple[int, ...]) -> str:
+        """Returns the priors key of this device at the given resolution."""
+        return f"{self.device_id}|{screen_shape[1]}x{screen_shape[0]}"
+
+    def _remember_location(self, template_name: str, screen_shape: Tuple[int, ...], location: Tuple[int, int]):
+        """Stores the location of a found template as its prior."""
+        if self.priors_file:
+            self.priors[self._prior_key(screen_shape)][template_name] = (int(location[0]), int(location[1]))
+
+    def _search_prior(self, frame: Frame, template_name: str, template_shape: Tuple[int, ...],
+                      threshold: float) -> Optional[Tuple[Region, Tuple[float, Tuple[int, int]]]]:
+        """
+        Checks a small window around the template's last known location.
+
+        Returns:
+            (searched window, (score, location)) if the template is found there,
+            otherwise None
+        """
+        location = self.priors.get(self._prior_key(frame.shape), {}).get(template_name)
+        if location is None:
+            return None
+
+        padding = self.PRIOR_PADDING
+        template_h, template_w = template_shape[:2]
+        window = self._clip_region((location[0] - padding, location[1] - padding,
+                                    template_w + 2 * padding, template_h + 2 * padding),
+                                   frame.shape, template_shape)
+        if window is None:
+            return None
+
+        space = self.match_space(template_name)
+        template = self.template_variant(template_name, space, self.screen_scale(frame.shape))
+        score, found_at = self._match_region(frame.variant(space), template, window)
+        if score < threshold:
+            return None
+        return window, (score, found_at)
+
+    def load_priors(self):
+        """Loads last known template locations from the priors file."""
+        if not self.priors_file or not os.path.exists(self.priors_file):
+            return
+        try:
+            with open(self.priors_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for key, locations in data.items():
+                self.priors[key].update({name: tuple(location) for name, location in locations.items()})
+            self.logger.debug(f"Загружены последние позиции шаблонов: {len(data)} устройств/разрешений")
+        except Exception as e:
+            self.logger.error(f"🚨 Ошибка при загрузке позиций шаблонов: {e}")
+
+    def save_priors(self):
+        """Saves last known template locations to the priors file."""
+        if not self.priors_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.priors_file)), exist_ok=True)
+            with open(self.priors_file, "w", encoding="utf-8") as f:
+                json.dump({key: {name: list(location) for name, location in locations.items()}
+                           for key, locations in self.priors.items()}, f, ensure_ascii=False, indent=2)
+            self.logger.debug(f"Позиции шаблонов сохранены: {self.priors_file}")
+        except Exception as e:
+            self.logger.error(f"🚨 Ошибка при сохранении позиций шаблонов: {e}")
+
+    def save_state(self):
+        """Saves everything learned during the session (transitions, template locations)."""
+        self.save_transitions()
+        self.save_priors()
+
+    def _cache_get(self, key: Tuple):
+        """Returns a cached result and marks it as recently used, or None."""
+        if not self.cache_size:
+            return None
+        with self._cache_lock:
+            result = self._result_cache.get(key)
+            if result is not None:
+                self._result_cache.move_to_end(key)
+        self._count("cache_hits" if result is not None else "cache_misses")
+        return result
+
+    def _cache_put(self, key: Tuple, result):
+        """Stores a result, evicting the least recently used entry when full."""
+        if not self.cache_size:
+            return
+        with self._cache_lock:
+            self._result_cache[key] = result
+            self._result_cache.move_to_end(key)
+            while len(self._result_cache) > self.cache_size:
+                self._result_cache.popitem(last=False)
+
+    def _count(self, counter: str):
+        """Increments a match counter."""
+        with self._counters_lock:
+            self.match_counters[counter] += 1
+
+    def _remember_search(self, frame: Frame, template_name: str, region: Optional[Region],
+                         threshold: float, result: Tuple[float, Tuple[int, int]]):
+        """Stores a search result together with the frame thumbnail it was made on."""
+        if not self.change_detection:
+            return
+        self._last_searches[template_name] = {
+            "thumbnail": frame.variant("gray", self.CHANGE_SCALE),
+            "region": region,
+            "threshold": threshold,
+            "result": result,
+        }
+
+    def _unchanged_search(self, frame: Frame, template_name: str, region: Optional[Region],
+                          threshold: float) -> Optional[Tuple[float, Tuple[int, int]]]:
+        """
+        Returns the previous result of a template if the region it would search
+        now was covered by that search and has not changed since.
+
+        Returns:
+            (score, location) of the previous search or None if matching is needed
+        """
+        if not self.change_detection:
+            return None
+        previous = self._last_searches.get(template_name)
+        if previous is None or previous["threshold"] != threshold:
+            return None
+
+        searched = previous["region"]
+        thumbnail = frame.variant("gray", self.CHANGE_SCALE)
+        previous_thumbnail = previous["thumbnail"]
+        if thumbnail.shape != previous_thumbnail.shape:
+            return None
+
+        if region is None:
+            region = (0, 0, frame.shape[1], frame.shape[0])
+        if searched is not None:
+            # Прошлый поиск должен покрывать всю текущую область
+            x, y, width, height = region
+            sx, sy, sw, sh = searched
+            if x < sx or y < sy or x + width > sx + sw or y + height > sy + sh:
+                return None
+
+        scale = self.CHANGE_SCALE
+        x, y, width, height = region
+        x0, y0 = int(x * scale), int(y * scale)
+        x1, y1 = int(np.ceil((x + width) * scale)), int(np.ceil((y + height) * scale))
+        diff = cv2.absdiff(thumbnail[y0:y1, x0:x1], previous_thumbnail[y0:y1, x0:x1])
+        if diff.size and int(diff.max()) > self.change_threshold:
+            return None
+        return previous["result"]
+
+    def screen_scale(self, screen_shape: Tuple[int, ...]) -> float:
+        """
+        Returns the template scale for a screen of the given shape.
+
+        Returns:
+            Ratio of the screen size to the reference resolution (1.0 at the
+            reference resolution)
+        """
+        reference_w, reference_h = self.reference_resolution
+        scale = min(screen_shape[1] / reference_w, screen_shape[0] / reference_h)
+        return round(scale, 4)
+
+    def to_screen(self, x: float, y: float, screen_shape: Tuple[int, ...]) -> Tuple[int, int]:
+        """
+        Maps a point from the reference resolution onto a screen.
+
+        The reference screen is scaled uniformly by screen_scale and centred,
+        so templates, regions and taps share one mapping even when the aspect
+        ratio differs from the reference.
+
+        Args:
+            x: X coordinate at the reference resolution
+            y: Y coordinate at the reference resolution
+            screen_shape: Shape (height, width, ...) of the screen
+
+        Returns:
+            (x, y) in screen pixels
+        """
+        reference_w, reference_h = self.reference_resolution
+        scale = self.screen_scale(screen_shape)
+        offset_x = (screen_shape[1] - reference_w * scale) / 2
+        offset_y = (screen_shape[0] - reference_h * scale) / 2
+        return int(round(x * scale + offset_x)), int(round(y * scale + offset_y))
+
+    def set_screen_size(self, width: int, height: int):
+        """
+        Sets the size of the device screen before the first frame arrives.
+
+        Template variants at the screen's scale are prepared by the template
+        bank in the background and written to its cache.
+        """
+        scale = self.screen_scale((height, width))
+        if scale == self.expected_scale:
+            return
+        self.expected_scale = scale
+        if self.template_bank is not None:
+            self.template_bank.warmup(self.required_variants)
+
+    def match_space(self, template_name: str) -> str:
+        """Returns the matching space of a template."""
+        return self.match_spaces.get(template_name, self.default_space)
+
+    def required_variants(self, template_name: str) -> List[Tuple[str, float]]:
+        """Returns the (space, scale) variants of a template used by matching at the expected screen scale."""
+        space = self.match_space(template_name)
+        scale = self.expected_scale
+        variants = [(space, scale)]
+        if space != "color":
+            # Цветной вариант задает размер шаблона при поиске и нужен проверкам пикселей
+            variants.append(("color", scale))
+        if self.match_mode == "pyramid":
+            variants.append((space, round(scale * self.pyramid_scale, 4)))
+        return variants
+
+    def template_variant(self, template_name: str, space: str, scale: float = 1.0) -> Optional[np.ndarray]:
+        """
+        Returns a cached copy of a template converted to a matching space and scale.
+
+        Args:
+            template_name: Name of the template
+            space: "color", "gray" or a single channel ("blue", "green", "red")
+            scale: Resize factor (1.0 for the original size)
+
+        Returns:
+            Template variant or None if the template could not be loaded
+        """
+        key = (template_name, space, scale)
+        variant = self.template_variants.get(key)
+        if variant is None and self.template_bank is not None:
+            variant = self.template_bank.variant(template_name, space, scale)
+            if variant is not None:
+                self.template_variants[key] = variant
+        elif variant is None:
+            template = self.load_template(template_name)
+            if template is None:
+                return None
+            variant = to_space(template, space)
+            if scale != 1.0:
+                interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+                variant = cv2.resize(variant, None, fx=scale, fy=scale, interpolation=interpolation)
+            self.template_variants[key] = variant
+        return variant
+
+    def _search(self, frame: Frame, template_name: str, region: Optional[Region],
+                threshold: float) -> Tuple[float, Tuple[int, int]]:
+        """
+        Finds the best match of a template inside a region (or the whole frame).
+
+        Frame and template are compared in the template's matching space. In
+        pyramid mode the region is first scanned on a downscaled frame, and
+        only the neighbourhoods of the best coarse candidates are matched at
+        full resolution.
+
+        Returns:
+            (best score, top-left location of the best match in screen coordinates)
+        """
+        space = self.match_space(template_name)
+        screen_img = frame.variant(space)
+        resolution_scale = self.screen_scale(screen_img.shape)
+        template = self.template_variant(template_name, space, resolution_scale)
+        if region is None:
+            region = (0, 0, screen_img.shape[1], screen_img.shape[0])
+
+        scale = self.pyramid_scale
+        if (self.match_mode != "pyramid" or
+                min(template.shape[:2]) * scale < self.PYRAMID_MIN_TEMPLATE_SIZE):
+            return self._match_bands(screen_img, template, region)
+
+        # Грубый проход на уменьшенном кадре
+        small_template = self.template_variant(template_name, space, round(resolution_scale * scale, 4))
+        x, y, width, height = region
+        small_region = (int(x * scale), int(y * scale),
+                        max(int(width * scale), small_template.shape[1]),
+                        max(int(height * scale), small_template.shape[0]))
+        small_screen = frame.variant(space, scale)
+        if (small_region[0] + small_region[2] > small_screen.shape[1] or
+                small_region[1] + small_region[3] > small_screen.shape[0]):
+            return self._match_region(screen_img, template, region)
+
+        sx, sy, sw, sh = small_region
+        coarse = cv2.matchTemplate(small_screen[sy:sy + sh, sx:sx + sw], small_template, cv2.TM_CCOEFF_NORMED)
+
+        # Уточнение лучших кандидатов в полном разрешении
+        cutoff = threshold - self.pyramid_tolerance
+        pad = int(np.ceil(1 / scale)) + 2
+        template_h, template_w = template.shape[:2]
+        small_h, small_w = small_template.shape[:2]
+        best_val, best_loc = -1.0, (x, y)
+
+        for _ in range(self.PYRAMID_CANDIDATES):
+            _, coarse_val, _, coarse_loc = cv2.minMaxLoc(coarse)
+            if coarse_val < cutoff:
+                if best_val < 0:
+                    # Ни один кандидат не прошел грубый отбор - возвращаем грубую оценку
+                    best_val = coarse_val
+                    best_loc = (int((coarse_loc[0] + sx) / scale), int((coarse_loc[1] + sy) / scale))
+                break
+
+            cand_x = int((coarse_loc[0] + sx) / scale)
+            cand_y = int((coarse_loc[1] + sy) / scale)
+            window = self._clip_region((cand_x - pad, cand_y - pad, template_w + 2 * pad, template_h + 2 * pad),
+                                       screen_img.shape, template.shape)
+            val, loc = self._match_region(screen_img, template, window or (0, 0, screen_img.shape[1],
+                                                                           screen_img.shape[0]))
+            if val > best_val:
+                best_val, best_loc = val, loc
+
+            # Подавляем окрестность кандидата, чтобы следующий был в другом месте
+            cx, cy = coarse_loc
+            coarse[max(0, cy - small_h // 2):cy + small_h // 2 + 1,
+                   max(0, cx - small_w // 2):cx + small_w // 2 + 1] = -1
+
+        return best_val, best_loc
+
+    def _match_bands(self, screen_img: np.ndarray, template: np.ndarray,
+                     region: Region) -> Tuple[float, Tuple[int, int]]:
+        """
+        Matches a large region as horizontal bands on the worker pool.
+
+        Bands overlap by the template height, so every placement of the
+        template lies fully inside one band and the result matches a single
+        matchTemplate over the region within float tolerance (scores near a
+        band edge may differ in the last bits, so equal peaks can tie-break
+        differently).
+
+        Returns:
+            (best score, top-left location of the best match in screen coordinates)
+        """
+        x, y, width, height = region
+        template_h = template.shape[0]
+        bands = min(self.max_workers, (height - template_h + 1) // template_h)
+        if width * height < self.PARALLEL_MIN_AREA or bands < 2 or getattr(self._worker_state, "active", False):
+            return self._match_region(screen_img, template, region)
+
+        # Каждая полоса содержит свою долю позиций шаблона плюс его высоту
+        positions = height - template_h + 1
+        step = -(-positions // bands)
+        regions = [(x, y + start, width, min(step, positions - start) + template_h - 1)
+                   for start in range(0, positions, step)]
+        results = self._map_parallel(lambda band: self._match_region(screen_img, template, band), regions)
+        return max(results, key=lambda result: result[0])
+
+    @staticmethod
+    def _match_region(screen_img: np.ndarray, template: np.ndarray,
+                      region: Region) -> Tuple[float, Tuple[int, int]]:
+        """
+        Runs matchTemplate over a region of the screen.
+
+        Returns:
+            (best score, top-left location of the best match in screen coordinates)
+        """
+        offset_x, offset_y, width, height = region
+        screen_img = screen_img[offset_y:offset_y + height, offset_x:offset_x + width]
+
+        result = cv2.matchTemplate(screen_img, template, cv2.TM_CCOEFF_NORMED)
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        return float(max_val), (max_loc[0] + offset_x, max_loc[1] + offset_y)
+
+    @staticmethod
+    def _clip_region(region: Region, screen_shape: Tuple[int, ...],
+                     template_shape: Tuple[int, ...]) -> Optional[Region]:
+        """
+        Clips a region to the screen and grows it to fit the template.
+
+        Returns:
+            Clipped region or None if it covers the whole screen
+        """
+        screen_h, screen_w = screen_shape[:2]
+        template_h, template_w = template_shape[:2]
+        x, y, width, height = region
+
+        width, height = max(width, template_w), max(height, template_h)
+        x = min(max(0, x), max(0, screen_w - width))
+        y = min(max(0, y), max(0, screen_h - height))
+        width, height = min(width, screen_w - x), min(height, screen_h - y)
+
+        if width >= screen_w and height >= screen_h:
+            return None
+        return x, y, width, height
+
+    def _search_region(self, template_name: str, screen_shape: Tuple[int, ...],
+                       template_shape: Tuple[int, ...]) -> Optional[Region]:
+        """
+        Returns the region to search for a template, or None for the full frame.
+
+        The full frame is searched when the template has no region yet or after
+        `roi_max_misses` consecutive misses inside its region.
+        """
+        state = self._roi_state.get(template_name)
+        if state is None:
+            base = self.regions.get(template_name)
+            scale = self.screen_scale(screen_shape)
+            if base is not None and (screen_shape[1], screen_shape[0]) != self.reference_resolution:
+                # Области заданы в координатах эталонного разрешения
+                x, y = self.to_screen(base[0], base[1], screen_shape)
+                base = (x, y, int(round(base[2] * scale)), int(round(base[3] * scale)))
+            state = {"base": base, "current": base, "misses": 0}
+            self._roi_state[template_name] = state
+
+        if state["current"] is None or state["misses"] >= self.roi_max_misses:
+            return None
+        return self._clip_region(state["current"], screen_shape, template_shape)
+
+    def _update_region(self, template_name: str, found: bool, location: Tuple[int, int],
+                       searched: Optional[Region], screen_shape: Tuple[int, ...],
+                       template_shape: Tuple[int, ...]):
+        """
+        Adapts the search region of a template after a search.
+
+        A hit centres the region on the match; a miss inside the region widens
+        it; a miss over the full frame resets it to its base region.
+        """
+        state = self._roi_state[template_name]
+        template_h, template_w = template_shape[:2]
+
+        if found:
+            margin = self.ROI_MARGIN
+            learned = self._clip_region(
+                (location[0] - margin, location[1] - margin, template_w + 2 * margin, template_h + 2 * margin),
+                screen_shape, template_shape)
+            state.update(base=learned, current=learned, misses=0)
+        elif searched is not None:
+            state["misses"] += 1
+            x, y, width, height = searched
+            new_w, new_h = int(width * self.ROI_WIDEN_FACTOR), int(height * self.ROI_WIDEN_FACTOR)
+            state["current"] = self._clip_region(
+                (x - (new_w - width) // 2, y - (new_h - height) // 2, new_w, new_h), screen_shape, template_shape)
+        else:
+            # Полный поиск тоже не нашел шаблон - его просто нет на экране
+            state.update(current=state["base"], misses=0)
+
     def wait_for_images(self,
-                    screen_provider: Callable[[], Optional[bytes]],
+                    screen_provider: Callable[[], Optional[ScreenData]],
                     image_list: List[str],
                     timeout: int = 90,
                     check_interval: float = 3) -> Tuple[Optional[str], Optional[Tuple[int, int]]]:
@@ -121,28 +1149,29 @@ class ImageMatcher:
         start_time = time.time()
 
         while time.time() - start_time < timeout:
-            screen_data = screen_provider()
-            if screen_data is None:
-                time.sleep(check_interval)
-                continue
-
-            for image_name in image_list:
-                match_location = self.find_in_screen(screen_data, image_name)
-                if match_location:
-                    self.logger.info(f"🏆 Изображение найдено: {image_name}")
-                    return image_name, match_location
+            check_start = time.time()
+            # Один кадр декодируется один раз для всех шаблонов списка
+            screen_data = Frame.from_screen(screen_provider())
+            if screen_data is not None:
+                # Порядок списка задает приоритет, поэтому проверяем по нему
+                results = self.match_many(screen_data, image_list, early_exit=True, learned_order=False)
+                for image_name in image_list:
+                    if results[image_name].found:
+                        self.logger.info(f"🏆 Изображение найдено: {image_name}")
+                        return image_name, results[image_name].location
 
-            time.sleep(check_interval)
+            # Время захвата и поиска входит в интервал проверки, а не добавляется к нему
+            time.sleep(max(0.0, check_interval - (time.time() - check_start)))
 
         self.logger.warning("⚠ Таймаут ожидания изображений")
         return None, None
 
-    def detect_keys(self, screen_data: bytes) -> int:
+    def detect_keys(self, screen_data: ScreenData) -> int:
         """
         Детектирует количество ключей, отображаемых на экране победы.
 
         Args:
-            screen_data: Данные снимка экрана
+            screen_data: Кадр (Frame) или данные снимка экрана
 
         Returns:
             Количество обнаруженных ключей или 0, если ничего не найдено
@@ -156,14 +1185,13 @@ class ImageMatcher:
                 self.ocr_helper = OCRHelper()
 
             # Конвертация данных экрана в формат OpenCV
-            screen_array = np.frombuffer(screen_data, dtype=np.uint8)
-            screen_img = cv2.imdecode(screen_array, cv2.IMREAD_COLOR)
+            screen_img = self.decode_screen(screen_data)
             if screen_img is None:
                 self.logger.error("🚨 Не удалось декодировать изображение экрана")
                 return 0
 
             # Сначала находим иконку ключа
-            key_icon = self.load_template("key_icon.png")
+            key_icon = self.template_variant("key_icon.png", "color", self.screen_scale(screen_img.shape))
             if key_icon is None:
                 self.logger.warning("⚠ Не найден шаблон ключа (key_icon.png)")
                 return 12  # Возвращаем значение по умолчанию
@@ -207,12 +1235,12 @@ class ImageMatcher:
             self.logger.error(f"🚨 Ошибка при распознавании количества ключей: {e}")
             return 12  # Возвращаем значение по умолчанию в случае ошибки
 
-    def detect_silver(self, screen_data: bytes) -> float:
+    def detect_silver(self, screen_data: ScreenData) -> float:
         """
         Детектирует количество серебра, отображаемого на экране победы.
 
         Args:
-            screen_data: Данные снимка экрана
+            screen_data: Кадр (Frame) или данные снимка экрана
 
         Returns:
             Количество обнаруженного серебра (в тысячах) или 0, если ничего не найдено
@@ -226,16 +1254,13 @@ class ImageMatcher:
                 self.ocr_helper = OCRHelper()
 
             # Конвертация данных экрана в формат OpenCV
-            import cv2
-            import numpy as np
-            screen_array = np.frombuffer(screen_data, dtype=np.uint8)
-            screen_img = cv2.imdecode(screen_array, cv2.IMREAD_COLOR)
+            screen_img = self.decode_screen(screen_data)
             if screen_img is None:
                 self.logger.error("🚨 Не удалось декодировать изображение экрана")
                 return 0
 
             # Сначала находим иконку серебра
-            silver_icon = self.load_template("silver_icon.png")
+            silver_icon = self.template_variant("silver_icon.png", "color", self.screen_scale(screen_img.shape))
             if silver_icon is None:
                 self.logger.warning("⚠ Не найден шаблон серебра (silver_icon.png)")
                 return 0  # Возвращаем значение по умолчанию
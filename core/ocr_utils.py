@@ -7,6 +7,8 @@ from PIL import Image
 import pytesseract
 from pathlib import Path
 
+from core.frame import Frame
+
 
 class OCRHelper:
     """Класс-помощник для работы с OCR."""
@@ -71,7 +73,7 @@ class OCRHelper:
         Распознает число на изображении с помощью OCR.
 
         Args:
-            image: Изображение для распознавания (numpy array)
+            image: Изображение для распознавания (numpy array или Frame)
             min_val: Минимальное допустимое значение
             max_val: Максимальное допустимое значение
             default_val: Значение по умолчанию, если распознавание не удалось
@@ -82,6 +84,9 @@ class OCRHelper:
         if not self.ocr_available:
             return default_val
 
+        if isinstance(image, Frame):
+            image = image.bgr
+
         try:
             # Предварительная обработка изображения для лучшего распознавания
             # Увеличиваем размер для лучшего распознавания
@@ -137,7 +142,7 @@ class OCRHelper:
         Распознает произвольный текст на изображении с помощью OCR.
 
         Args:
-            image: Изображение для распознавания (numpy array)
+            image: Изображение для распознавания (numpy array или Frame)
             default_val: Значение по умолчанию, если распознавание не удалось
 
         Returns:
@@ -146,6 +151,9 @@ class OCRHelper:
         if not self.ocr_available:
             return default_val
 
+        if isinstance(image, Frame):
+            image = image.bgr
+
         try:
             # Предварительная обработка изображения для лучшего распознавания
             # Увеличиваем размер для лучшего распознавания
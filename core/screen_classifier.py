@@ -0,0 +1,129 @@
+import os
+import json
+import logging
+import cv2
+import numpy as np
+from typing import List, Optional, Tuple
+
+from core.frame import Frame
+
+
+def dhash(gray: np.ndarray, hash_size: int = 8) -> bytes:
+    """
+    Computes the difference hash of a grayscale image.
+
+    The image is shrunk to (hash_size + 1) x hash_size pixels and every bit
+    tells whether a pixel is brighter than its left neighbour, so the hash
+    survives small shifts, scaling and compression noise.
+
+    Args:
+        gray: Grayscale image
+        hash_size: Bits per row and number of rows
+
+    Returns:
+        hash_size * hash_size bits packed into bytes
+    """
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    return np.packbits(small[:, 1:] > small[:, :-1]).tobytes()
+
+
+class ScreenClassifier:
+    """
+    Identifies known screens by a perceptual hash of the frame.
+
+    The index holds dHash signatures of labelled reference screenshots; a
+    frame is assigned the label of the nearest signature by Hamming distance.
+    Labels are template names; the proposed screen's template is matched
+    first, and only a template match decides what is on screen.
+    """
+
+    def __init__(self, hash_size: int = 8, max_distance: int = 10):
+        """
+        Args:
+            hash_size: dHash size (hash_size^2 bits per signature)
+            max_distance: Largest Hamming distance accepted as a match
+        """
+        self.hash_size = hash_size
+        self.max_distance = max_distance
+        self.logger = logging.getLogger("BotLogger")
+
+        self.labels: List[str] = []
+        # packbits pads the last byte, so a row holds ceil(bits / 8) bytes
+        self._hashes = np.zeros((0, (hash_size * hash_size + 7) // 8), dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def signature(self, screen_data) -> Optional[bytes]:
+        """Computes the dHash of a frame, or None if it cannot be decoded."""
+        frame = Frame.from_screen(screen_data)
+        gray = frame.gray if frame is not None else None
+        if gray is None:
+            return None
+        return dhash(gray, self.hash_size)
+
+    def add(self, label: str, signature: bytes):
+        """Adds a labelled signature to the index."""
+        row = np.frombuffer(signature, dtype=np.uint8)[np.newaxis]
+        self._hashes = np.vstack([self._hashes, row])
+        self.labels.append(label)
+
+    def distances(self, signature: bytes) -> np.ndarray:
+        """Returns the Hamming distance from a signature to every index entry."""
+        query = np.frombuffer(signature, dtype=np.uint8)
+        return np.unpackbits(np.bitwise_xor(self._hashes, query), axis=1).sum(axis=1)
+
+    def classify(self, screen_data) -> Optional[Tuple[str, int]]:
+        """
+        Proposes the known screen shown on a frame.
+
+        Args:
+            screen_data: Frame, PNG bytes or BGR image
+
+        Returns:
+            (label, distance) of the nearest reference, or None if the index is
+            empty or no reference is within max_distance
+        """
+        if not self.labels:
+            return None
+        signature = self.signature(screen_data)
+        if signature is None:
+            return None
+
+        distances = self.distances(signature)
+        best = int(np.argmin(distances))
+        distance = int(distances[best])
+        if distance > self.max_distance:
+            return None
+        return self.labels[best], distance
+
+    def save(self, path: str):
+        """Writes the index to a JSON file."""
+        data = {
+            "hash_size": self.hash_size,
+            "entries": [{"label": label, "hash": row.tobytes().hex()}
+                        for label, row in zip(self.labels, self._hashes)],
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path: str, max_distance: int = 10) -> "ScreenClassifier":
+        """
+        Reads an index built by tools/build_screen_index.py.
+
+        Args:
+            path: Path to the JSON index
+            max_distance: Largest Hamming distance accepted as a match
+
+        Returns:
+            ScreenClassifier with the loaded index
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        classifier = cls(hash_size=data["hash_size"], max_distance=max_distance)
+        for entry in data["entries"]:
+            classifier.add(entry["label"], bytes.fromhex(entry["hash"]))
+        return classifier
@@ -0,0 +1,276 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+import cv2
+import numpy as np
+from typing import Callable, Dict, List, Optional, Tuple
+
+from core.frame import to_space
+
+# Template variant key: (template name, matching space, scale)
+VariantKey = Tuple[str, str, float]
+
+
+class TemplateBank:
+    """
+    Preloaded templates and every variant the matcher needs.
+
+    Templates are scanned once at startup in a background thread. Converted
+    variants (matching space, pyramid levels) and statistics are stored in a
+    single .npz cache file; a manifest with the size, mtime and SHA-1 of each
+    source file decides which entries are still valid on the next start.
+    """
+
+    CACHE_VERSION = 1
+    TEMPLATE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+    def __init__(self, template_dir: str, cache_path: Optional[str] = None):
+        """
+        Args:
+            template_dir: Directory with template images
+            cache_path: Path of the .npz cache file; None disables the disk cache
+        """
+        self.template_dir = template_dir
+        self.cache_path = cache_path
+        self.logger = logging.getLogger("BotLogger")
+
+        self.templates: Dict[str, np.ndarray] = {}
+        self.variants: Dict[VariantKey, np.ndarray] = {}
+        # Template statistics: name -> {"shape", "mean", "std"}
+        self.stats: Dict[str, Dict] = {}
+
+        self._lock = threading.RLock()
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def warmup(self, required_variants: Callable[[str], List[Tuple[str, float]]]):
+        """
+        Starts loading all templates in a background thread.
+
+        Calling it again (e.g. once the screen scale is known) prepares the
+        newly required variants after the previous warmup has finished.
+
+        Args:
+            required_variants: Function returning the (space, scale) variants
+                needed for a template name (e.g. ImageMatcher.required_variants)
+        """
+        previous = self._thread
+        self._thread = threading.Thread(target=self._warmup, args=(previous, required_variants), daemon=True)
+        self._thread.start()
+
+    def _warmup(self, previous: Optional[threading.Thread],
+                required_variants: Callable[[str], List[Tuple[str, float]]]):
+        """Runs a warmup after the previous one."""
+        if previous is not None:
+            previous.join()
+        self.load(required_variants)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Waits for the background warmup; returns True if it has finished."""
+        return self._ready.wait(timeout)
+
+    def is_ready(self) -> bool:
+        """Returns True once all templates were loaded."""
+        return self._ready.is_set()
+
+    def load(self, required_variants: Callable[[str], List[Tuple[str, float]]]):
+        """
+        Loads all templates and their variants, using the disk cache when valid.
+
+        Args:
+            required_variants: Function returning the (space, scale) variants
+                needed for a template name
+        """
+        try:
+            names = sorted(f for f in os.listdir(self.template_dir)
+                           if f.lower().endswith(self.TEMPLATE_EXTENSIONS))
+        except OSError as e:
+            self.logger.error(f"🚨 Не удалось прочитать папку шаблонов {self.template_dir}: {e}")
+            self._ready.set()
+            return
+
+        try:
+            manifest, arrays = self._read_cache()
+            entries = {}
+            changed = False
+
+            for name in names:
+                entry = self._file_entry(name, manifest.get(name))
+                if entry is None:
+                    continue
+                cached = manifest.get(name)
+                valid = cached is not None and cached["sha1"] == entry["sha1"]
+                changed |= not valid or cached["mtime"] != entry["mtime"]
+
+                with self._lock:
+                    if valid and f"{name}|template" in arrays:
+                        self.templates.setdefault(name, arrays[f"{name}|template"])
+                        self.stats.setdefault(name, cached["stats"])
+                        for space, scale in cached["variants"]:
+                            key = f"{name}|{space}|{scale}"
+                            if key in arrays:
+                                self.variants.setdefault((name, space, scale), arrays[key])
+
+                for space, scale in required_variants(name):
+                    if (name, space, scale) not in self.variants:
+                        changed = True
+                    self.variant(name, space, scale)
+
+                entry["stats"] = self.stats.get(name)
+                entry["variants"] = [[s, k] for n, s, k in self.variants if n == name]
+                entries[name] = entry
+
+            changed |= manifest.keys() != entries.keys()
+            if changed:
+                self._write_cache(entries)
+            self.logger.info(
+                f"✅ Банк шаблонов готов: {len(self.templates)} шаблонов, {len(self.variants)} вариантов"
+                f"{'' if changed else ' (из кеша)'}")
+        except Exception as e:
+            self.logger.error(f"🚨 Ошибка при подготовке банка шаблонов: {e}")
+        finally:
+            self._ready.set()
+
+    def template(self, template_name: str) -> Optional[np.ndarray]:
+        """
+        Returns a template image, loading it from disk if the bank has not reached it yet.
+
+        Returns:
+            BGR template or None if it could not be loaded
+        """
+        with self._lock:
+            template = self.templates.get(template_name)
+        if template is not None:
+            return template
+
+        template_path = os.path.join(self.template_dir, template_name)
+        if not os.path.exists(template_path):
+            self.logger.error(f"🚨 Файл шаблона не найден: {template_path}")
+            return None
+
+        template = cv2.imread(template_path, cv2.IMREAD_COLOR)
+        if template is None:
+            self.logger.error(f"🚨 Не удалось загрузить шаблон: {template_path}")
+            return None
+
+        std = float(np.std(template))
+        if std < 1.0:
+            # Для однотонного шаблона TM_CCOEFF_NORMED не дает осмысленной оценки
+            self.logger.warning(f"⚠ Шаблон {template_name} почти однотонный (std={std:.2f})")
+
+        with self._lock:
+            template = self.templates.setdefault(template_name, template)
+            self.stats.setdefault(template_name, {
+                "shape": list(template.shape),
+                "mean": float(np.mean(template)),
+                "std": std,
+            })
+        return template
+
+    def variant(self, template_name: str, space: str, scale: float = 1.0) -> Optional[np.ndarray]:
+        """
+        Returns a template converted to a matching space and scale.
+
+        Args:
+            template_name: Name of the template
+            space: "color", "gray" or a single channel ("blue", "green", "red")
+            scale: Resize factor (1.0 for the original size)
+
+        Returns:
+            Template variant or None if the template could not be loaded
+        """
+        key = (template_name, space, scale)
+        with self._lock:
+            variant = self.variants.get(key)
+        if variant is not None:
+            return variant
+
+        template = self.template(template_name)
+        if template is None:
+            return None
+        variant = to_space(template, space)
+        if scale != 1.0:
+            interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+            variant = cv2.resize(variant, None, fx=scale, fy=scale, interpolation=interpolation)
+
+        with self._lock:
+            return self.variants.setdefault(key, variant)
+
+    def _file_entry(self, name: str, cached: Optional[Dict]) -> Optional[Dict]:
+        """
+        Builds the manifest entry of a template file.
+
+        The SHA-1 is reused from the cached entry when size and mtime are
+        unchanged, so an unchanged file is not read at all.
+        """
+        path = os.path.join(self.template_dir, name)
+        try:
+            stat = os.stat(path)
+            entry = {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+            if cached and cached["size"] == entry["size"] and cached["mtime"] == entry["mtime"]:
+                entry["sha1"] = cached["sha1"]
+            else:
+                with open(path, "rb") as f:
+                    entry["sha1"] = hashlib.sha1(f.read()).hexdigest()
+        except OSError as e:
+            self.logger.error(f"🚨 Не удалось прочитать шаблон {path}: {e}")
+            return None
+        return entry
+
+    def _read_cache(self) -> Tuple[Dict[str, Dict], Dict[str, np.ndarray]]:
+        """
+        Reads the cache file.
+
+        Returns:
+            (manifest, arrays); both empty if there is no valid cache
+        """
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}, {}
+        try:
+            with np.load(self.cache_path, allow_pickle=False) as data:
+                header = json.loads(data["manifest"].tobytes().decode("utf-8"))
+                if header.get("version") != self.CACHE_VERSION:
+                    return {}, {}
+                manifest = header["templates"]
+                for entry in manifest.values():
+                    entry["variants"] = [(space, float(scale)) for space, scale in entry["variants"]]
+                arrays = {key: data[key] for key in data.files if key != "manifest"}
+            return manifest, arrays
+        except Exception as e:
+            self.logger.warning(f"⚠ Кеш шаблонов поврежден и будет пересоздан: {e}")
+            return {}, {}
+
+    def _write_cache(self, entries: Dict[str, Dict]):
+        """Writes templates, variants and the manifest into the cache file."""
+        if not self.cache_path:
+            return
+
+        arrays = {}
+        with self._lock:
+            for name in entries:
+                arrays[f"{name}|template"] = self.templates[name]
+            for (name, space, scale), variant in self.variants.items():
+                if name in entries:
+                    arrays[f"{name}|{space}|{scale}"] = variant
+        header = {"version": self.CACHE_VERSION, "templates": entries}
+        arrays["manifest"] = np.frombuffer(json.dumps(header).encode("utf-8"), dtype=np.uint8)
+
+        temp_path = None
+        try:
+            cache_dir = os.path.dirname(os.path.abspath(self.cache_path))
+            os.makedirs(cache_dir, exist_ok=True)
+            # Пишем в уникальный временный файл рядом с кешем: прерванная запись не испортит
+            # кеш, а одновременные записи (несколько ботов, повторный прогрев) не столкнутся
+            with tempfile.NamedTemporaryFile(dir=cache_dir, prefix=".template_cache_", suffix=".tmp",
+                                             delete=False) as f:
+                temp_path = f.name
+                np.savez(f, **arrays)
+            os.replace(temp_path, self.cache_path)
+            self.logger.debug(f"Кеш шаблонов сохранен: {self.cache_path}")
+        except Exception as e:
+            self.logger.error(f"🚨 Не удалось сохранить кеш шаблонов: {e}")
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
@@ -0,0 +1,303 @@
+import re
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+# Linux input event types and codes used for touch injection
+EV_SYN = 0
+EV_KEY = 1
+EV_ABS = 3
+SYN_REPORT = 0
+BTN_TOUCH = 330
+ABS_X = 0
+ABS_Y = 1
+ABS_MT_SLOT = 47
+ABS_MT_TOUCH_MAJOR = 48
+ABS_MT_POSITION_X = 53
+ABS_MT_POSITION_Y = 54
+ABS_MT_TRACKING_ID = 57
+ABS_MT_PRESSURE = 58
+
+# Shell runner: (command, timeout) -> (exit_code, stdout) or None
+CommandRunner = Callable[[str, float], Optional[Tuple[int, bytes]]]
+
+
+def parse_getevent(output: str) -> List[Dict]:
+    """
+    Parses `getevent -pl` output into a list of input device descriptions.
+
+    Args:
+        output: Text printed by `getevent -pl`
+
+    Returns:
+        List of dicts with the device path, name, supported codes and axis ranges
+    """
+    devices = []
+    for block in re.split(r"^add device \d+:\s*", output, flags=re.MULTILINE)[1:]:
+        lines = block.splitlines()
+        device = {
+            "path": lines[0].strip(),
+            "name": "",
+            "codes": set(),
+            "axes": {},
+            "direct": "INPUT_PROP_DIRECT" in block,
+        }
+
+        name_match = re.search(r'name:\s*"([^"]*)"', block)
+        if name_match:
+            device["name"] = name_match.group(1)
+
+        for code in re.findall(r"\b((?:ABS|BTN)_[A-Z_]+)\b", block):
+            device["codes"].add(code)
+
+        for axis, minimum, maximum in re.findall(
+                r"\b(ABS_[A-Z_]+)\s*:\s*value -?\d+, min (-?\d+), max (-?\d+)", block):
+            device["axes"][axis] = (int(minimum), int(maximum))
+
+        devices.append(device)
+    return devices
+
+
+def parse_wm_size(output: str) -> Optional[Tuple[int, int]]:
+    """
+    Parses `wm size` output, preferring the override size when present.
+
+    Returns:
+        (width, height) or None if the output has no size
+    """
+    sizes = dict(re.findall(r"(Physical|Override) size:\s*(\d+x\d+)", output))
+    size = sizes.get("Override") or sizes.get("Physical")
+    if not size:
+        return None
+    width, height = size.split("x")
+    return int(width), int(height)
+
+
+def parse_orientation(output: str) -> Optional[int]:
+    """
+    Parses the current display rotation from `dumpsys input` output.
+
+    Older Android versions print `SurfaceOrientation: N` for the touchscreen;
+    newer ones only list `orientation=N` in the internal display viewport.
+
+    Returns:
+        Rotation in quarter turns (0-3) or None if the output has no rotation
+    """
+    match = re.search(r"SurfaceOrientation:\s*(\d)", output)
+    if not match:
+        match = re.search(r"Viewport INTERNAL:[^\n]*?\borientation=(\d)", output)
+    if not match or int(match.group(1)) > 3:
+        return None
+    return int(match.group(1))
+
+
+def to_natural(x: int, y: int, rotation: int, natural_size: Tuple[int, int]) -> Tuple[int, int]:
+    """
+    Maps a point on the rotated display to the display's natural orientation.
+
+    Touch axes are fixed to the natural orientation, while screenshots and
+    tap coordinates follow the current rotation. This is the inverse of the
+    transform InputReader applies to raw touches.
+
+    Args:
+        x: X coordinate on the rotated display
+        y: Y coordinate on the rotated display
+        rotation: Display rotation in quarter turns (0-3)
+        natural_size: (width, height) in the natural orientation
+
+    Returns:
+        (x, y) in the natural orientation
+    """
+    width, height = natural_size
+    if rotation == 1:
+        return width - 1 - y, x
+    if rotation == 2:
+        return width - 1 - x, height - 1 - y
+    if rotation == 3:
+        return y, height - 1 - x
+    return x, y
+
+
+class TouchInjector:
+    """
+    Tap backend that writes raw touch events with `sendevent`.
+
+    `input tap` starts a JVM on the device for every tap; `sendevent` is a
+    small native tool, and all events of a tap are sent in one shell command.
+    Touchscreen node, axis ranges and the display rotation are probed once
+    and cached. Touch axes do not rotate with the display, so the rotation is
+    read again when captured frames flip between portrait and landscape.
+    """
+
+    def __init__(self, run_command: CommandRunner):
+        """
+        Args:
+            run_command: Function that runs a shell command on the device and
+                returns (exit_code, stdout) or None; a fake runner can stand in
+                for a device when testing offline
+        """
+        self.run_command = run_command
+        self.logger = logging.getLogger("BotLogger")
+
+        # Cached touchscreen geometry; None until probed, {} if probing failed
+        self.geometry: Optional[Dict] = None
+        self._tracking_id = 0
+        # Display rotation; None until read or after a frame orientation flip
+        self._orientation: Optional[int] = None
+
+    def probe(self) -> bool:
+        """
+        Finds the touchscreen node and its coordinate ranges.
+
+        Returns:
+            True if the device supports sendevent taps
+        """
+        if self.geometry is not None:
+            return bool(self.geometry)
+        self.geometry = {}
+
+        events = self.run_command("getevent -pl", 10)
+        size = self.run_command("wm size", 5)
+        if not events or events[0] != 0 or not size or size[0] != 0:
+            self.logger.warning("⚠ Не удалось получить параметры сенсорного экрана устройства")
+            return False
+
+        screen_size = parse_wm_size(size[1].decode("utf-8", errors="ignore"))
+        devices = parse_getevent(events[1].decode("utf-8", errors="ignore"))
+
+        # Сенсорный экран - устройство с осями X/Y, предпочтительно с INPUT_PROP_DIRECT
+        candidates = [d for d in devices
+                      if {"ABS_MT_POSITION_X", "ABS_MT_POSITION_Y"} <= d["axes"].keys()
+                      or {"ABS_X", "ABS_Y"} <= d["axes"].keys()]
+        candidates.sort(key=lambda d: not d["direct"])
+        if not candidates or not screen_size:
+            self.logger.warning("⚠ Сенсорный экран для sendevent не найден")
+            return False
+
+        device = candidates[0]
+        multitouch = "ABS_MT_POSITION_X" in device["axes"]
+        x_range = device["axes"]["ABS_MT_POSITION_X" if multitouch else "ABS_X"]
+        y_range = device["axes"]["ABS_MT_POSITION_Y" if multitouch else "ABS_Y"]
+
+        # wm size и оси сенсора заданы в естественной ориентации; если они не совпадают,
+        # сенсор повернут относительно дисплея - остаемся на input tap
+        screen_landscape = screen_size[0] > screen_size[1]
+        touch_landscape = (x_range[1] - x_range[0]) > (y_range[1] - y_range[0])
+        if screen_landscape != touch_landscape and x_range[1] != y_range[1]:
+            self.logger.warning("⚠ Оси сенсорного экрана повернуты относительно дисплея, sendevent отключен")
+            return False
+
+        self.geometry = {
+            "path": device["path"],
+            "multitouch": multitouch,
+            "x_range": x_range,
+            "y_range": y_range,
+            "screen_size": screen_size,
+            "btn_touch": "BTN_TOUCH" in device["codes"],
+            "tracking_id": "ABS_MT_TRACKING_ID" in device["axes"],
+            "slot": "ABS_MT_SLOT" in device["axes"],
+            "pressure": device["axes"].get("ABS_MT_PRESSURE"),
+            "touch_major": device["axes"].get("ABS_MT_TOUCH_MAJOR"),
+        }
+        self.logger.info(
+            f"✅ Сенсорный экран {device['path']} ({device['name']}): "
+            f"X {x_range}, Y {y_range}, экран {screen_size[0]}x{screen_size[1]}")
+        return True
+
+    def orientation(self) -> Optional[int]:
+        """
+        Returns the display rotation, reading it with `dumpsys input` if it is not cached.
+
+        A failed read is not cached, so the next tap tries again.
+
+        Returns:
+            Rotation in quarter turns (0-3) or None if it cannot be determined
+        """
+        if self._orientation is not None:
+            return self._orientation
+
+        result = self.run_command("dumpsys input", 10)
+        orientation = None
+        if result and result[0] == 0:
+            orientation = parse_orientation(result[1].decode("utf-8", errors="ignore"))
+        if orientation is None:
+            self.logger.warning("⚠ Не удалось определить поворот дисплея для sendevent")
+        elif orientation != self._orientation:
+            self.logger.info(f"Поворот дисплея: {orientation * 90}°")
+        self._orientation = orientation
+        return orientation
+
+    def frame_captured(self, width: int, height: int):
+        """
+        Checks a captured frame's size against the cached display rotation.
+
+        If the frame is landscape while the cached rotation implies portrait
+        (or the other way round), the display has turned and the rotation is
+        read again on the next tap. A 180° turn keeps the frame shape and is
+        not detected.
+        """
+        if self._orientation is None or not self.geometry:
+            return
+        natural_w, natural_h = self.geometry["screen_size"]
+        expected_landscape = (natural_w > natural_h) != (self._orientation % 2 == 1)
+        if (width > height) != expected_landscape and width != height:
+            self.logger.debug("Ориентация кадра изменилась, поворот дисплея будет перечитан")
+            self._orientation = None
+
+    def _scale(self, value: int, screen_extent: int, axis_range: Tuple[int, int]) -> int:
+        """Maps a screen coordinate onto the touch axis range."""
+        minimum, maximum = axis_range
+        value = min(max(value, 0), screen_extent - 1)
+        return minimum + round(value * (maximum - minimum) / max(1, screen_extent - 1))
+
+    def tap_command(self, x: int, y: int) -> Optional[str]:
+        """
+        Builds a shell command that performs a tap with raw touch events.
+
+        Args:
+            x: X coordinate in screen pixels (current display rotation)
+            y: Y coordinate in screen pixels (current display rotation)
+
+        Returns:
+            Command string or None if the device was not probed successfully
+            or the display rotation is unknown
+        """
+        if not self.probe():
+            return None
+        rotation = self.orientation()
+        if rotation is None:
+            return None
+
+        geo = self.geometry
+        width, height = geo["screen_size"]
+        x, y = to_natural(x, y, rotation, geo["screen_size"])
+        touch_x = self._scale(x, width, geo["x_range"])
+        touch_y = self._scale(y, height, geo["y_range"])
+
+        down: List[Tuple[int, int, int]] = []
+        up: List[Tuple[int, int, int]] = []
+        if geo["multitouch"]:
+            self._tracking_id = (self._tracking_id + 1) % 65535
+            if geo["slot"]:
+                down.append((EV_ABS, ABS_MT_SLOT, 0))
+            if geo["tracking_id"]:
+                down.append((EV_ABS, ABS_MT_TRACKING_ID, self._tracking_id))
+                up.append((EV_ABS, ABS_MT_TRACKING_ID, -1))
+            down.append((EV_ABS, ABS_MT_POSITION_X, touch_x))
+            down.append((EV_ABS, ABS_MT_POSITION_Y, touch_y))
+            if geo["touch_major"]:
+                down.append((EV_ABS, ABS_MT_TOUCH_MAJOR, max(1, geo["touch_major"][1] // 8)))
+            if geo["pressure"]:
+                down.append((EV_ABS, ABS_MT_PRESSURE, max(1, geo["pressure"][1] // 2)))
+        else:
+            down.append((EV_ABS, ABS_X, touch_x))
+            down.append((EV_ABS, ABS_Y, touch_y))
+
+        if geo["btn_touch"]:
+            down.append((EV_KEY, BTN_TOUCH, 1))
+            up.append((EV_KEY, BTN_TOUCH, 0))
+        down.append((EV_SYN, SYN_REPORT, 0))
+        up.append((EV_SYN, SYN_REPORT, 0))
+
+        path = geo["path"]
+        return " && ".join(f"sendevent {path} {t} {c} {v}" for t, c, v in down + up)
@@ -72,6 +72,7 @@ def init_bot_engine(stats_manager):
 
     # Отладочная информация
     logging.info(f"Путь к ADB: {adb_path}")
+    logging.info(f"Устройство ADB: {config.get('adb', 'serial', '') or 'по умолчанию'}")
     logging.info(f"Шаблоны изображений: {template_dir}")
     logging.info(f"Существует ли папка с шаблонами? {os.path.exists(template_dir)}")
 
@@ -89,10 +90,81 @@ def init_bot_engine(stats_manager):
     from core.adb_controller import AdbController
     from core.image_matcher import ImageMatcher
     from core.bot_engine import BotEngine
-
-    adb_controller = AdbController(adb_path)
-    image_matcher = ImageMatcher(template_dir)
-    bot_engine = BotEngine(adb_controller, image_matcher)
+    from core.frame_grabber import FrameGrabber
+    from core.frame import Frame
+    from core.template_bank import TemplateBank
+    from core.screen_classifier import ScreenClassifier
+
+    adb_controller = AdbController(
+        adb_path,
+        persistent_shell=config.get("adb", "persistent_shell", True),
+        capture_mode=config.get("adb", "capture_mode", "auto"),
+        socket_client=config.get("adb", "socket_client", True),
+        server_host=config.get("adb", "server_host", "127.0.0.1"),
+        server_port=config.get("adb", "server_port", 5037),
+        tap_backend=config.get("adb", "tap_backend", "input"),
+        serial=config.get("adb", "serial", "") or None
+    )
+    template_cache = None
+    if config.get("matching", "template_cache", True):
+        template_cache = os.path.join(config.get("license", "directory"), "template_cache.npz")
+    template_bank = TemplateBank(template_dir, cache_path=template_cache)
+
+    screen_classifier = None
+    screen_index = resource_path(config.get("matching", "screen_index", "resources/screen_index.json"))
+    if os.path.exists(screen_index):
+        try:
+            screen_classifier = ScreenClassifier.load(
+                screen_index, max_distance=config.get("matching", "screen_max_distance", 10))
+            logging.info(f"Классификатор экранов загружен: {len(screen_classifier)} эталонов")
+        except Exception as e:
+            logging.error(f"Не удалось загрузить индекс экранов {screen_index}: {e}")
+
+    transitions_file = None
+    if config.get("matching", "learn_transitions", True):
+        transitions_file = os.path.join(config.get("license", "directory"), "screen_transitions.json")
+
+    priors_file = None
+    if config.get("matching", "location_priors", True):
+        priors_file = os.path.join(config.get("license", "directory"), "template_locations.json")
+
+    image_matcher = ImageMatcher(
+        template_dir,
+        regions=config.get("matching", "regions", {}),
+        roi_max_misses=config.get("matching", "roi_max_misses", 3),
+        match_mode=config.get("matching", "mode", "full"),
+        pyramid_scale=config.get("matching", "pyramid_scale", 0.5),
+        pyramid_tolerance=config.get("matching", "pyramid_tolerance", 0.1),
+        match_spaces=config.get("matching", "spaces", {}),
+        default_space=config.get("matching", "default_space", "color"),
+        template_bank=template_bank,
+        screen_classifier=screen_classifier,
+        transitions_file=transitions_file,
+        change_detection=config.get("matching", "change_detection", True),
+        change_threshold=config.get("matching", "change_threshold", 8),
+        priors_file=priors_file,
+        device_id=config.get("adb", "serial", "") or "default",
+        pixel_probes=config.get("matching", "pixel_probes", False),
+        max_workers=config.get("matching", "max_workers", 0),
+        cv_threads=config.get("matching", "cv_threads", None),
+        bots_per_host=config.get("matching", "bots_per_host", 1),
+        reference_resolution=tuple(config.get("matching", "reference_resolution", [1600, 900])),
+        cache_size=config.get("matching", "cache_size", 256)
+    )
+    # Шаблоны готовятся в фоне, пока устанавливается соединение с устройством
+    template_bank.warmup(image_matcher.required_variants)
+
+    frame_grabber = None
+    if config.get("capture", "background_grabber", False):
+        frame_grabber = FrameGrabber(
+            lambda: Frame.from_screen(adb_controller.capture_screen()),
+            max_fps=config.get("capture", "max_fps", 5),
+            buffer_size=config.get("capture", "buffer_size", 3),
+            idle_timeout=config.get("capture", "idle_timeout", 5)
+        )
+        logging.info("Фоновый захват кадров включен")
+
+    bot_engine = BotEngine(adb_controller, image_matcher, frame_grabber)
 
     # Устанавливаем менеджер статистики
     bot_engine.set_stats_manager(stats_manager)
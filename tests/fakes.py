@@ -0,0 +1,186 @@
+"""
+Offline stand-ins for an Android device and the adb server, used by the tests.
+"""
+import re
+import time
+import socket
+import threading
+from typing import Callable, List, Optional, Tuple
+
+GETEVENT_TEMPLATE = """add device 1: /dev/input/event1
+  name:     "gpio-keys"
+  events:
+    KEY (0001): KEY_VOLUMEDOWN        KEY_VOLUMEUP
+add device 2: /dev/input/event2
+  name:     "fake_touchscreen"
+  events:
+    KEY (0001): BTN_TOUCH
+    ABS (0003): ABS_MT_SLOT           : value 0, min 0, max 9, fuzz 0, flat 0, resolution 0
+                ABS_MT_TOUCH_MAJOR    : value 0, min 0, max 255, fuzz 0, flat 0, resolution 0
+                ABS_MT_POSITION_X     : value 0, min 0, max {x_max}, fuzz 0, flat 0, resolution 0
+                ABS_MT_POSITION_Y     : value 0, min 0, max {y_max}, fuzz 0, flat 0, resolution 0
+                ABS_MT_TRACKING_ID    : value 0, min 0, max 65535, fuzz 0, flat 0, resolution 0
+  input props:
+    INPUT_PROP_DIRECT
+"""
+
+
+class FakeTouchDevice:
+    """
+    Shell of a device with a multitouch screen, for TouchInjector.
+
+    Answers `getevent -pl`, `wm size` and `dumpsys input`, and executes
+    `sendevent` chains, recording every touch-down position in raw axis units.
+    """
+
+    def __init__(self, natural_size: Tuple[int, int] = (1080, 1920),
+                 axis_max: Tuple[int, int] = (4095, 4095), rotation: Optional[int] = 0,
+                 viewport_only: bool = False):
+        """
+        Args:
+            natural_size: Display size in the natural orientation
+            axis_max: Maximum raw X and Y touch values
+            rotation: Display rotation in quarter turns; None hides it from dumpsys
+            viewport_only: Report rotation the way newer Android does (viewport line only)
+        """
+        self.natural_size = natural_size
+        self.axis_max = axis_max
+        self.rotation = rotation
+        self.viewport_only = viewport_only
+        self.commands: List[str] = []
+        self.touches: List[Tuple[int, int]] = []
+
+    def run(self, command: str, timeout: float) -> Optional[Tuple[int, bytes]]:
+        """CommandRunner implementation."""
+        self.commands.append(command)
+        if command == "getevent -pl":
+            text = GETEVENT_TEMPLATE.format(x_max=self.axis_max[0], y_max=self.axis_max[1])
+        elif command == "wm size":
+            text = "Physical size: {}x{}\n".format(*self.natural_size)
+        elif command == "dumpsys input":
+            text = self._dumpsys_input()
+        elif command.startswith("sendevent "):
+            self._sendevent(command)
+            text = ""
+        else:
+            return 127, b""
+        return 0, text.encode("utf-8")
+
+    def _dumpsys_input(self) -> str:
+        if self.rotation is None:
+            return "INPUT MANAGER (dumpsys input)\n"
+        if self.viewport_only:
+            return ("Input Reader State:\n  Configuration:\n    Viewports:\n"
+                    "      Viewport INTERNAL: displayId=0, uniqueId=local:0, port=0, "
+                    f"orientation={self.rotation}, logicalFrame=[0, 0, 1080, 1920]\n")
+        return f"    Raw Touch Axes:\n    SurfaceOrientation: {self.rotation}\n"
+
+    def _sendevent(self, command: str):
+        position = {}
+        for event in command.split(" && "):
+            _, _, event_type, code, value = event.split()
+            if int(event_type) == 3 and int(code) in (53, 54):
+                position[int(code)] = int(value)
+        self.touches.append((position[53], position[54]))
+
+
+class FakeAdbServer:
+    """
+    Local adb server speaking the smart-socket protocol, for AdbSocketClient.
+
+    Supports `host:devices`, `host:transport:<serial>`, `host:transport-any`
+    and `exec:` services. Commands are answered by a handler; the exit-code
+    marker appended by AdbSocketClient.run is echoed back like a real shell.
+    """
+
+    def __init__(self, handler: Callable[[str], Tuple[int, bytes]] = None,
+                 serials: Tuple[str, ...] = ("emulator-5554",), transport_delay: float = 0.0):
+        """
+        Args:
+            handler: Function mapping a shell command to (exit_code, stdout)
+            serials: Serials of the connected devices
+            transport_delay: Seconds to wait before accepting a transport switch
+        """
+        self.handler = handler or (lambda command: (0, b""))
+        self.serials = serials
+        self.transport_delay = transport_delay
+        self.commands: List[str] = []
+        self.connections = 0
+
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(("127.0.0.1", 0))
+        self._server.listen(16)
+        self.host, self.port = self._server.getsockname()
+        self._thread = threading.Thread(target=self._accept_loop, daemon=True)
+
+    def __enter__(self) -> "FakeAdbServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.close()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    @staticmethod
+    def _recv_exact(conn: socket.socket, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            chunk = conn.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("client closed")
+            data += chunk
+        return data
+
+    def _serve(self, conn: socket.socket):
+        with conn:
+            try:
+                while True:
+                    length = int(self._recv_exact(conn, 4), 16)
+                    request = self._recv_exact(conn, length).decode("utf-8")
+                    if not self._handle(conn, request):
+                        return
+            except (ConnectionError, OSError, ValueError):
+                return
+
+    def _fail(self, conn: socket.socket, message: str):
+        data = message.encode("utf-8")
+        conn.sendall(b"FAIL" + b"%04x" % len(data) + data)
+
+    def _handle(self, conn: socket.socket, request: str) -> bool:
+        """Answers one request; returns True if the connection stays open."""
+        if request == "host:devices":
+            data = "".join(f"{serial}\tdevice\n" for serial in self.serials).encode("utf-8")
+            conn.sendall(b"OKAY" + b"%04x" % len(data) + data)
+            return False
+        if request.startswith("host:transport"):
+            serial = request[len("host:transport:"):] if ":" in request[5:] else None
+            if serial is not None and serial not in self.serials:
+                self._fail(conn, f"device '{serial}' not found")
+                return False
+            time.sleep(self.transport_delay)
+            conn.sendall(b"OKAY")
+            return True
+        if request.startswith("exec:"):
+            command = request[len("exec:"):]
+            self.commands.append(command)
+            conn.sendall(b"OKAY")
+            conn.sendall(self._execute(command))
+            return False
+        self._fail(conn, f"unknown service {request}")
+        return False
+
+    def _execute(self, command: str) -> bytes:
+        match = re.fullmatch(r"\{ (.*); \} 2>/dev/null; echo (\S+)\$\?", command, re.DOTALL)
+        if not match:
+            return self.handler(command)[1]
+        exit_code, output = self.handler(match.group(1))
+        return output + f"{match.group(2)}{exit_code}\n".encode("utf-8")
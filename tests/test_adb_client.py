@@ -0,0 +1,69 @@
+import time
+import unittest
+
+from core.adb_client import AdbProtocolError, AdbSocketClient
+from core.adb_controller import AdbController
+from tests.fakes import FakeAdbServer
+
+
+def echo_handler(command):
+    if command.startswith("echo "):
+        return 0, command[5:].encode("utf-8") + b"\n"
+    return 1, b""
+
+
+class AdbSocketClientTest(unittest.TestCase):
+    """AdbSocketClient against a local stand-in adb server."""
+
+    def test_run_returns_exit_code_and_output(self):
+        with FakeAdbServer(echo_handler) as server:
+            client = AdbSocketClient(server.host, server.port)
+            try:
+                self.assertEqual(client.run(None, "echo hi"), (0, bytearray(b"hi\n")))
+                self.assertEqual(client.run("emulator-5554", "false")[0], 1)
+            finally:
+                client.close()
+
+    def test_unknown_device_is_rejected(self):
+        with FakeAdbServer(echo_handler) as server:
+            client = AdbSocketClient(server.host, server.port)
+            with self.assertRaises(AdbProtocolError):
+                client.run("missing", "echo hi")
+
+    def test_devices(self):
+        with FakeAdbServer(serials=("a", "b")) as server:
+            client = AdbSocketClient(server.host, server.port)
+            self.assertEqual(client.devices(), [("a", "device"), ("b", "device")])
+
+    def test_prefill_does_not_delay_the_command(self):
+        # Каждое переключение на устройство занимает 0.4 с; команда ждет только свое
+        with FakeAdbServer(echo_handler, transport_delay=0.4) as server:
+            client = AdbSocketClient(server.host, server.port)
+            try:
+                started = time.monotonic()
+                self.assertEqual(client.run(None, "echo one")[0], 0)
+                self.assertLess(time.monotonic() - started, 0.75)
+
+                # Фоновое пополнение пула готовит соединение для следующей команды
+                deadline = time.monotonic() + 2
+                while not client._transport_pool.get("") and time.monotonic() < deadline:
+                    time.sleep(0.02)
+                started = time.monotonic()
+                self.assertEqual(client.run(None, "echo two"), (0, bytearray(b"two\n")))
+                self.assertLess(time.monotonic() - started, 0.35)
+            finally:
+                client.close()
+
+    def test_controller_uses_configured_server(self):
+        with FakeAdbServer(echo_handler, serials=("emu-1",)) as server:
+            controller = AdbController("adb", socket_client=True, serial="emu-1",
+                                       server_host=server.host, server_port=server.port)
+            try:
+                self.assertEqual(controller._run_shell("echo ok"), (0, bytearray(b"ok\n")))
+                self.assertIn("echo ok", server.commands[0])
+            finally:
+                controller.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+
+from core.touch_injector import TouchInjector, parse_orientation, to_natural
+from tests.fakes import FakeTouchDevice
+
+
+class TouchInjectorRotationTest(unittest.TestCase):
+    """Taps given in the rotated display's coordinates land on the same physical spot."""
+
+    def tap(self, device, x, y):
+        injector = TouchInjector(device.run)
+        command = injector.tap_command(x, y)
+        if command:
+            device.run(command, 5)
+        return command
+
+    def test_natural_orientation(self):
+        device = FakeTouchDevice(natural_size=(1081, 1921), axis_max=(1080, 1920), rotation=0)
+        self.tap(device, 100, 1500)
+        self.assertEqual(device.touches, [(100, 1500)])
+
+    def test_rotations(self):
+        # Дисплей 1080x1920 в естественной ориентации; точка в 100 px от левого
+        # и 200 px от верхнего края повернутого изображения
+        cases = {
+            1: (1079 - 200, 100),
+            2: (1079 - 100, 1919 - 200),
+            3: (200, 1919 - 100),
+        }
+        for rotation, expected in cases.items():
+            with self.subTest(rotation=rotation):
+                device = FakeTouchDevice(natural_size=(1080, 1920), axis_max=(1079, 1919),
+                                         rotation=rotation)
+                self.tap(device, 100, 200)
+                self.assertEqual(device.touches, [expected])
+
+    def test_rotation_from_viewport(self):
+        device = FakeTouchDevice(natural_size=(1080, 1920), axis_max=(1079, 1919),
+                                 rotation=1, viewport_only=True)
+        self.tap(device, 100, 200)
+        self.assertEqual(device.touches, [(879, 100)])
+
+    def test_unknown_rotation_refuses_sendevent(self):
+        device = FakeTouchDevice(rotation=None)
+        self.assertIsNone(self.tap(device, 100, 200))
+        self.assertEqual(device.touches, [])
+
+    def test_rotation_is_cached(self):
+        device = FakeTouchDevice(rotation=1)
+        injector = TouchInjector(device.run)
+        injector.tap_command(10, 10)
+        injector.tap_command(20, 20)
+        self.assertEqual(device.commands.count("dumpsys input"), 1)
+
+    def test_rotation_reread_after_frame_flip(self):
+        device = FakeTouchDevice(natural_size=(1080, 1920), axis_max=(1079, 1919), rotation=0)
+        injector = TouchInjector(device.run)
+        injector.tap_command(10, 10)
+
+        # Портретный кадр совпадает с поворотом 0 - повторного чтения нет
+        injector.frame_captured(1080, 1920)
+        injector.tap_command(10, 10)
+        self.assertEqual(device.commands.count("dumpsys input"), 1)
+
+        # Дисплей повернулся: кадр стал альбомным
+        device.rotation = 1
+        injector.frame_captured(1920, 1080)
+        device.run(injector.tap_command(100, 200), 5)
+        self.assertEqual(device.commands.count("dumpsys input"), 2)
+        self.assertEqual(device.touches[-1], (879, 100))
+
+    def test_to_natural_round_trip_corners(self):
+        size = (1080, 1920)
+        # Углы повернутого дисплея переходят в углы естественного
+        self.assertEqual(to_natural(0, 0, 1, size), (1079, 0))
+        self.assertEqual(to_natural(1919, 1079, 1, size), (0, 1919))
+        self.assertEqual(to_natural(0, 0, 3, size), (0, 1919))
+
+    def test_parse_orientation(self):
+        self.assertEqual(parse_orientation("  SurfaceOrientation: 3\n"), 3)
+        self.assertEqual(parse_orientation("Viewport INTERNAL: displayId=0, orientation=2, x"), 2)
+        self.assertIsNone(parse_orientation("Viewport EXTERNAL: displayId=1, orientation=1"))
+        self.assertIsNone(parse_orientation(""))
+
+
+if __name__ == "__main__":
+    unittest.main()
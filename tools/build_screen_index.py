@@ -0,0 +1,127 @@
+"""
+Builds the screen classifier index from labelled reference screenshots.
+
+Reference screenshots are grouped in folders named after the template that
+confirms the screen:
+
+    screens/
+        victory/        -> label "victory.png"
+            1.png
+            2.png
+        auto_battle/    -> label "auto_battle.png"
+            ...
+
+Usage:
+    python tools/build_screen_index.py screens resources/screen_index.json
+
+Besides writing the index, the tool prints a leave-one-out accuracy report
+(each screenshot classified against all the others) and the average
+signature + lookup latency per frame.
+"""
+import os
+import sys
+import time
+import argparse
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+
+from core.screen_classifier import ScreenClassifier
+
+
+def load_samples(reference_dir):
+    """Returns a list of (label, image path) pairs from the reference folders."""
+    samples = []
+    for folder in sorted(os.listdir(reference_dir)):
+        folder_path = os.path.join(reference_dir, folder)
+        if not os.path.isdir(folder_path):
+            continue
+        label = folder if folder.lower().endswith((".png", ".jpg", ".jpeg")) else f"{folder}.png"
+        for file_name in sorted(os.listdir(folder_path)):
+            if file_name.lower().endswith((".png", ".jpg", ".jpeg")):
+                samples.append((label, os.path.join(folder_path, file_name)))
+    return samples
+
+
+def report(classifier, signatures):
+    """Prints leave-one-out accuracy, rejections and confusions per label."""
+    total = Counter()
+    correct = Counter()
+    rejected = Counter()
+    confusions = Counter()
+
+    for i, (label, signature) in enumerate(signatures):
+        distances = classifier.distances(signature)
+        distances[i] = np.iinfo(distances.dtype).max
+        best = int(np.argmin(distances))
+
+        total[label] += 1
+        if distances[best] > classifier.max_distance:
+            rejected[label] += 1
+        elif classifier.labels[best] == label:
+            correct[label] += 1
+        else:
+            confusions[(label, classifier.labels[best])] += 1
+
+    print(f"\n{'Экран':<30} {'Образцов':>9} {'Верно':>7} {'Отказ':>7}")
+    for label in sorted(total):
+        print(f"{label:<30} {total[label]:>9} {correct[label]:>7} {rejected[label]:>7}")
+
+    samples = sum(total.values())
+    if samples:
+        print(f"\nТочность (leave-one-out): {sum(correct.values()) / samples:.1%}, "
+              f"без ответа: {sum(rejected.values()) / samples:.1%}")
+    for (label, predicted), count in confusions.most_common():
+        print(f"  Путаница: {label} -> {predicted} ({count})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Построение индекса классификатора экранов")
+    parser.add_argument("reference_dir", help="Папка с подпапками эталонных скриншотов")
+    parser.add_argument("output", help="Путь к файлу индекса (JSON)")
+    parser.add_argument("--hash-size", type=int, default=8, help="Размер dHash (бит на строку)")
+    parser.add_argument("--max-distance", type=int, default=10, help="Макс. расстояние Хэмминга")
+    args = parser.parse_args()
+
+    samples = load_samples(args.reference_dir)
+    if not samples:
+        print(f"В папке {args.reference_dir} не найдено эталонных скриншотов")
+        return 1
+
+    classifier = ScreenClassifier(hash_size=args.hash_size, max_distance=args.max_distance)
+    signatures = []
+    images = []
+    for label, path in samples:
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            print(f"Пропущен нечитаемый файл: {path}")
+            continue
+        signature = classifier.signature(image)
+        classifier.add(label, signature)
+        signatures.append((label, signature))
+        images.append(image)
+
+    if not images:
+        print("Не удалось прочитать ни одного эталонного скриншота")
+        return 1
+
+    classifier.save(args.output)
+    print(f"Индекс сохранен: {args.output} ({len(classifier)} образцов, "
+          f"{len(set(classifier.labels))} экранов)")
+
+    report(classifier, signatures)
+
+    # Задержка: подпись и поиск по уже декодированному кадру, как в боте
+    started = time.perf_counter()
+    for image in images:
+        classifier.classify(image)
+    latency = (time.perf_counter() - started) / len(images) * 1000
+    print(f"\nСредняя задержка классификации: {latency:.2f} мс на кадр")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())